@@ -1,76 +1,336 @@
-from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException
+import time
+
+# Taken before the imports below so the startup timings include them.
+IMPORTS_STARTED = time.perf_counter()
+
+import asyncio
+import json
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-import pandas as pd
-import torch
-from setfit import SetFitModel
-from config import MODEL_PATH, DATA_DIR, ACTIONABLE_BUCKETS, ID2LABEL
-from pipeline import classify, generate_response
-import os
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from config import (
+    API_MODE, ACTIONABLE_BUCKETS, ID2LABEL, LABEL2ID, INFERENCE_BACKEND, MESSAGES_PATH, PROCESSED_MESSAGES_PATH,
+    SLACK_ENQUEUE_TIMEOUT,
+)
+from pipeline import build_prompt, classify, generate_batch, generate_response
+from classifier import get_device, load_model, message_text, warm_up
+from embedding_cache import open_embedding_cache
+from head_refit import apply_saved_corrections, load_corrections, refit_head, relabel, save_corrections
+from draft_queue import DraftQueue, priority_key
+from draft_reuse import DraftReuse, adapt_draft, embed_rows
+from llm_client import get_client
+from message_io import read_messages, write_messages
+from message_store import MessageStore, SnapshotStore, df_to_json_safe
+from metrics import CONTENT_TYPE, registry
+from slack_stream import MicroBatcher, slack_to_row
+from snapshot import SnapshotPublisher, SnapshotWatcher
 
 # Global state
 model = None
-messages_df = None
+embedding_cache = None
+store = None
+draft_queue = None
+draft_reuse = None
+slack_batcher = None
+snapshot_publisher = None
+snapshot_watcher = None
+startup_phase = "starting"
+# Seconds spent in each startup phase, reported by /health/ready and /metrics.
+startup_timings = {"imports": round(time.perf_counter() - IMPORTS_STARTED, 3)}
+# Serializes classification of ingested batches against each other.
+ingest_lock = threading.Lock()
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_seconds", "API latency until response headers, by route.", ("method", "route", "status"),
+)
+MESSAGES_SERVED = registry.gauge("messages_loaded", "Messages held by the message store.")
+MESSAGES_SERVED.set_function(lambda: len(store) if store is not None else 0)
+STARTUP_SECONDS = registry.gauge("startup_phase_seconds", "Time spent in each startup phase.", ("phase",))
+STARTUP_SECONDS.set(startup_timings["imports"], phase="imports")
+
+
+class IncomingMessage(BaseModel):
+    """One message row, same schema as your_messages.csv."""
+    message_id: str
+    source_system: str = ""
+    source_account: str = ""
+    workspace_or_domain: str = ""
+    channel_type: str = ""
+    channel_name: str = ""
+    thread_id: str = ""
+    timestamp_utc: str = ""
+    sender_name: str = ""
+    sender_handle_or_email: str = ""
+    recipient: str = ""
+    sent_to_external: bool = False
+    subject_or_topic: str
+    message_snippet: str
+    category: str = ""
+    order_id: str = ""
+    priority: str = ""
+
+
+class SlackReference(BaseModel):
+    message_id: str
+    ref_type: str
+
+
+class SlackMessage(BaseModel):
+    """A NormalizedMessage from the Slack conversations service."""
+    message_id: str
+    conversation_id: str
+    text: str = ""
+    user: str = ""
+    timestamp: str = ""
+    ref_message_ids: list[SlackReference] = []
+
+
+class SlackIngest(BaseModel):
+    channel_name: str = ""
+    workspace: str = ""
+    messages: list[SlackMessage]
+
+
+class LabelCorrection(BaseModel):
+    """The right action bucket for an already loaded message."""
+    message_id: str
+    label: str
+
+
+@contextmanager
+def startup_stage(phase: str):
+    """Enter a startup phase and record how long it took."""
+    global startup_phase
+
+    startup_phase = phase
+    start = time.perf_counter()
+    yield
+    startup_timings[phase] = round(time.perf_counter() - start, 3)
+    STARTUP_SECONDS.set(startup_timings[phase], phase=phase)
 
 
-def get_device():
-    if torch.backends.mps.is_available():
-        return "mps"
-    elif torch.cuda.is_available():
-        return "cuda"
-    return "cpu"
+def store_draft(message_id: str, draft: str):
+    """Write a finished draft back into the served messages.
 
+    ``ERROR:`` drafts are not stored, so the next request for the message
+    generates it again instead of serving the error.
+    """
+    if draft.startswith("ERROR:"):
+        return
+    store.update(message_id, draft_response=draft)
 
-def df_to_json_safe(df: pd.DataFrame) -> list[dict]:
-    """Convert DataFrame to JSON-safe list of dicts, handling NaN values."""
-    return df.fillna("").to_dict(orient="records")
 
+def reuse_draft(row: dict, leader: dict, leader_draft: str | None):
+    """Adapt a finished leader draft for ``row``, generating its own draft if that isn't possible."""
+    draft = adapt_draft(leader_draft, leader, row) if leader_draft else None
+    if draft is None:
+        draft_queue.submit(row)
+    else:
+        store_draft(row["message_id"], draft)
 
-def generate_responses_batched(df: pd.DataFrame, batch_size: int = 5) -> list[str]:
-    """Generate responses for actionable messages in batches."""
-    from pipeline import generate_response as gen_response
 
-    responses = []
-    total = len(df)
+def follow_leader(row: dict, leader: dict):
+    """Reuse the leader's draft once it exists, queueing the leader if it has none yet."""
+    existing = (store.get(leader["message_id"]) or {}).get("draft_response")
+    if existing:
+        reuse_draft(row, leader, existing)
+        return
 
-    for i in range(0, total, batch_size):
-        batch = df.iloc[i:i+batch_size]
-        print(f"Generating responses {i+1}-{min(i+batch_size, total)} of {total}...")
-        for _, row in batch.iterrows():
-            responses.append(gen_response(row))
+    def on_done(future):
+        if not future.cancelled():
+            reuse_draft(row, leader, future.result() if future.exception() is None else None)
 
-    return responses
+    draft_queue.submit(leader).add_done_callback(on_done)
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    global model, messages_df
+def queue_drafts(rows: list[dict]) -> tuple[int, int]:
+    """Queue drafts for actionable rows, sharing one generation per near-duplicate cluster.
+
+    Returns the number of rows queued for generation and the number that
+    follow a cluster leader's draft.
+    """
+    if not rows:
+        return 0, 0
+    # Within a batch the most urgent message of a cluster leads it.
+    rows = sorted(rows, key=priority_key)
+    if draft_reuse.enabled:
+        leaders = draft_reuse.assign(rows, embed_rows(rows, model, embedding_cache))
+    else:
+        leaders = [None] * len(rows)
+
+    for row, leader in zip(rows, leaders):
+        if leader is None:
+            draft_queue.submit(row)
+        else:
+            follow_leader(row, leader)
+    reused = sum(leader is not None for leader in leaders)
+    return len(rows) - reused, reused
+
+
+def load_and_classify():
+    """Load the model and classify messages, then queue drafts in the background."""
+    global model, embedding_cache, store, startup_phase
+
+    try:
+        with startup_stage("loading_model"):
+            device = get_device()
+            print(f"Loading {INFERENCE_BACKEND} model on {device}...")
+            model = load_model(device)
+            embedding_cache = open_embedding_cache(model)
+            model = apply_saved_corrections(model, embedding_cache)
+
+        with startup_stage("warming_up"):
+            warm_up(model)
+
+        with startup_stage("classifying"):
+            print("Loading and classifying messages...")
+            df = read_messages(MESSAGES_PATH)
+            df = classify(df, model, cache=embedding_cache)
+            df["draft_response"] = ""
+            write_messages(df, PROCESSED_MESSAGES_PATH)
+            store = MessageStore.from_dataframe(df)
+            print(f"Loaded {len(store)} messages")
+    except Exception:
+        startup_phase = "failed"
+        raise
+
+    if snapshot_publisher is not None:
+        snapshot_publisher.publish()
+        snapshot_publisher.start()
+
+    # Drafts are generated by the queue; list endpoints are usable from here on.
+    startup_phase = "ready"
+    actionable = [row for tag in ACTIONABLE_BUCKETS for row in store.rows(tag)]
+    print(f"Queueing drafts for {len(actionable)} actionable messages...")
+    queued, reused = queue_drafts(actionable)
+    print(f"Queued {queued} drafts; {reused} near-duplicates reuse a cluster draft")
+
+    print(f"Startup complete: {startup_timings}")
+
+
+def ingest_messages(rows: list[dict]) -> dict:
+    """Classify rows not seen before, add them to the store and queue their drafts."""
+    with ingest_lock:
+        new_rows = {}
+        for row in rows:
+            if row["message_id"] not in store:
+                new_rows.setdefault(row["message_id"], row)
+
+        classified = []
+        if new_rows:
+            import pandas as pd
+            df = classify(pd.DataFrame(list(new_rows.values())), model, cache=embedding_cache)
+            df["draft_response"] = ""
+            classified = df_to_json_safe(df)
+            store.append(classified)
+
+    queued, reused = queue_drafts([row for row in classified if row["action_bucket"] in ACTIONABLE_BUCKETS])
 
-    device = get_device()
-    print(f"Loading model on {device}...")
-    model = SetFitModel.from_pretrained(MODEL_PATH)
-    model.to(device)
+    return {
+        "received": len(rows),
+        "added": len(classified),
+        "duplicates": len(rows) - len(classified),
+        "drafts_queued": queued,
+        "drafts_reused": reused,
+        "messages": [
+            {
+                "message_id": row["message_id"],
+                "action_bucket": row["action_bucket"],
+                "classification_confidence": row["classification_confidence"],
+            }
+            for row in classified
+        ],
+    }
 
-    print("Loading and classifying messages...")
-    messages_df = pd.read_csv(os.path.join(DATA_DIR, "your_messages.csv"))
-    messages_df = classify(messages_df, model)
-    print(f"Loaded {len(messages_df)} messages")
 
-    # Pre-generate responses for actionable messages
-    actionable_mask = messages_df["action_bucket"].isin(ACTIONABLE_BUCKETS)
-    actionable_df = messages_df[actionable_mask]
+def apply_corrections(corrections: list[dict]) -> dict:
+    """Refit the head with new label corrections, swap it in and relabel only the rows that changed."""
+    global model
 
-    if len(actionable_df) > 0:
-        print(f"Pre-generating responses for {len(actionable_df)} actionable messages...")
-        messages_df.loc[actionable_mask, "draft_response"] = generate_responses_batched(actionable_df)
-    else:
-        messages_df["draft_response"] = ""
+    with ingest_lock:
+        saved = load_corrections()
+        for correction in corrections:
+            row = store.get(correction["message_id"])
+            saved[correction["message_id"]] = {"text": message_text(row), "label": correction["label"]}
+
+        start = time.perf_counter()
+        refit = refit_head(model, saved, cache=embedding_cache)
+        save_corrections(saved)
+        # Requests that already hold the old model finish with it; new ones get the refit head.
+        model = refit
 
-    # Fill non-actionable with empty string
-    messages_df["draft_response"] = messages_df["draft_response"].fillna("")
+        rows = store.records()
+        previous = {row["message_id"]: row["action_bucket"] for row in rows}
+        changes = relabel(rows, model, saved, cache=embedding_cache)
+        for change in changes:
+            store.update(**change)
+        elapsed = time.perf_counter() - start
+
+    newly_actionable = [
+        store.get(change["message_id"]) for change in changes
+        if change["action_bucket"] in ACTIONABLE_BUCKETS and previous[change["message_id"]] not in ACTIONABLE_BUCKETS
+    ]
+    queued, reused = queue_drafts([dict(row) for row in newly_actionable if not row.get("draft_response")])
+
+    return {
+        "corrections": len(saved),
+        "refit_ms": round(elapsed * 1000, 1),
+        "reclassified": len(changes),
+        "relabelled": sum(change["action_bucket"] != previous[change["message_id"]] for change in changes),
+        "drafts_queued": queued,
+        "drafts_reused": reused,
+    }
 
-    print("Startup complete.")
+
+def load_snapshot(version: int, table):
+    """Swap in a snapshot published by the builder (worker mode)."""
+    global store, startup_phase
+
+    store = SnapshotStore(table)
+    startup_phase = "ready"
+    print(f"Serving snapshot {version} ({len(store)} messages)")
+
+
+def require_builder():
+    if API_MODE == "worker":
+        raise HTTPException(status_code=503, detail="Not available on worker processes; send to the builder")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global draft_queue, draft_reuse, slack_batcher, snapshot_publisher, snapshot_watcher, startup_phase
+
+    if API_MODE == "worker":
+        # Workers never load the model or call the LLM; they serve the builder's snapshots.
+        startup_phase = "waiting_for_snapshot"
+        snapshot_watcher = SnapshotWatcher(on_load=load_snapshot)
+        snapshot_watcher.start()
+        yield
+        snapshot_watcher.stop()
+        return
+
+    draft_queue = DraftQueue(
+        generate=lambda row, refresh: generate_response(row, refresh=refresh),
+        on_result=store_draft,
+        generate_batch=generate_batch,
+    )
+    draft_reuse = DraftReuse()
+    slack_batcher = MicroBatcher(handle=ingest_messages)
+    if API_MODE == "builder":
+        snapshot_publisher = SnapshotPublisher(get_store=lambda: store)
+    threading.Thread(target=load_and_classify, name="startup", daemon=True).start()
     yield
+    slack_batcher.close()
+    draft_queue.close()
+    if snapshot_publisher is not None:
+        snapshot_publisher.stop()
+    if store is not None:
+        # Persist drafts and ingested messages alongside the startup classification.
+        write_messages(store.to_dataframe(), PROCESSED_MESSAGES_PATH)
 
 
 app = FastAPI(title="Message Classification API", lifespan=lifespan)
@@ -84,6 +344,59 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - start, method=request.method, route=route, status=response.status_code,
+    )
+    return response
+
+
+@app.get("/metrics")
+async def metrics():
+    """Per-stage counters and latencies in Prometheus text format."""
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/health/live")
+async def liveness():
+    """Report that the process is up, even while startup is still running."""
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """Report ready once messages are classified; drafts may still be pending."""
+    if startup_phase != "ready":
+        raise HTTPException(
+            status_code=503, detail={"ready": False, "phase": startup_phase, "startup_seconds": startup_timings},
+        )
+    return {"ready": True, "phase": startup_phase, "startup_seconds": startup_timings}
+
+
+@app.get("/drafts/progress")
+async def get_draft_progress():
+    """Get background draft generation progress."""
+    if draft_queue is None:
+        return {"phase": startup_phase, "mode": API_MODE, "snapshot_version": snapshot_watcher.version}
+    return {
+        "phase": startup_phase,
+        **draft_queue.progress(),
+        "reuse": draft_reuse.progress(),
+        "cache": get_client().cache.stats(),
+    }
+
+
+@app.delete("/drafts/cache")
+async def clear_draft_cache():
+    """Drop every cached draft so the next generation calls the LLM again."""
+    require_builder()
+    return {"removed": get_client().cache.clear()}
+
+
 @app.get("/tags")
 async def get_tags():
     """List available classification tags."""
@@ -96,53 +409,119 @@ async def get_tags():
 @app.get("/messages")
 async def get_messages():
     """Get all messages grouped by tag."""
-    if messages_df is None:
+    if store is None:
         raise HTTPException(status_code=503, detail="Messages not loaded")
 
-    grouped = {}
-    for tag in ID2LABEL.values():
-        tag_messages = messages_df[messages_df["action_bucket"] == tag]
-        grouped[tag] = df_to_json_safe(tag_messages)
-
-    return grouped
+    return Response(content=store.grouped_json(), media_type="application/json")
 
 
 @app.get("/messages/{tag}")
 async def get_messages_by_tag(tag: str):
     """Get messages for a specific tag."""
-    if messages_df is None:
+    if store is None:
         raise HTTPException(status_code=503, detail="Messages not loaded")
 
     if tag not in ID2LABEL.values():
         raise HTTPException(status_code=404, detail=f"Unknown tag: {tag}")
 
-    tag_messages = messages_df[messages_df["action_bucket"] == tag]
-    return {
-        "tag": tag,
-        "count": len(tag_messages),
-        "messages": df_to_json_safe(tag_messages)
-    }
+    return Response(content=store.tag_json(tag), media_type="application/json")
 
 
-@app.post("/generate-response/{message_id}")
-async def generate_response_for_message(message_id: str):
-    """Generate a draft response for an actionable message."""
-    if messages_df is None:
+@app.post("/messages/ingest")
+async def ingest(messages: list[IncomingMessage]):
+    """Classify and add new messages; IDs already loaded are skipped."""
+    require_builder()
+    if startup_phase != "ready":
         raise HTTPException(status_code=503, detail="Messages not loaded")
 
-    row = messages_df[messages_df["message_id"] == message_id]
-    if row.empty:
-        raise HTTPException(status_code=404, detail=f"Message not found: {message_id}")
+    rows = [message.model_dump() for message in messages]
+    return await run_in_threadpool(ingest_messages, rows)
+
+
+@app.get("/labels/corrections")
+async def get_corrections():
+    """List saved label corrections by message ID."""
+    return load_corrections()
+
+
+@app.post("/labels/corrections")
+async def correct_labels(corrections: list[LabelCorrection]):
+    """Refit the classification head on corrected labels and reclassify affected messages."""
+    require_builder()
+    if startup_phase != "ready":
+        raise HTTPException(status_code=503, detail="Messages not loaded")
 
-    row = row.iloc[0]
+    for correction in corrections:
+        if correction.label not in LABEL2ID:
+            raise HTTPException(status_code=422, detail=f"Unknown label: {correction.label}")
+        if correction.message_id not in store:
+            raise HTTPException(status_code=404, detail=f"Message {correction.message_id} not found")
+
+    rows = [correction.model_dump() for correction in corrections]
+    return await run_in_threadpool(apply_corrections, rows)
+
+
+@app.post("/slack/ingest", status_code=202)
+async def ingest_slack(payload: SlackIngest):
+    """Queue normalized Slack messages for micro-batched classification and drafting.
+
+    Answers 429 when the queue stays full, so senders back off instead of
+    piling messages up in memory.
+    """
+    require_builder()
+    if startup_phase != "ready":
+        raise HTTPException(status_code=503, detail="Messages not loaded")
+
+    rows = [slack_to_row(message.model_dump(), payload.channel_name, payload.workspace) for message in payload.messages]
+    new_rows = [row for row in rows if row["message_id"] not in store]
+    if len(new_rows) > slack_batcher.capacity:
+        raise HTTPException(status_code=413, detail=f"At most {slack_batcher.capacity} messages per request")
+    if not await run_in_threadpool(slack_batcher.put_many, new_rows, SLACK_ENQUEUE_TIMEOUT):
+        raise HTTPException(status_code=429, detail="Ingest queue is full", headers={"Retry-After": "1"})
+    return {"received": len(rows), "queued": len(new_rows), "duplicates": len(rows) - len(new_rows)}
+
+
+@app.get("/slack/ingest")
+async def get_slack_ingest_progress():
+    """Report the Slack ingest queue and batches classified so far."""
+    require_builder()
+    return slack_batcher.progress()
+
+
+def get_actionable_row(message_id: str) -> dict:
+    if store is None:
+        raise HTTPException(status_code=503, detail="Messages not loaded")
+
+    row = store.get(message_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"Message not found: {message_id}")
 
     if row["action_bucket"] not in ACTIONABLE_BUCKETS:
         raise HTTPException(
             status_code=400,
             detail=f"Message is not actionable (tag: {row['action_bucket']})"
         )
+    return row
 
-    draft = generate_response(row)
+
+@app.post("/generate-response/{message_id}")
+async def generate_response_for_message(message_id: str, regenerate: bool = False):
+    """Generate a draft response for an actionable message.
+
+    Set ``regenerate`` to bypass the existing and cached drafts.
+    """
+    row = get_actionable_row(message_id)
+
+    draft = row["draft_response"]
+    if regenerate or not draft:
+        require_builder()
+        # Jumps ahead of the background queue and joins any generation in flight.
+        future = draft_queue.submit(row, urgent=True, refresh=regenerate)
+        try:
+            draft = await asyncio.wrap_future(future)
+        except Exception as error:
+            # E.g. a stream this request joined failed part-way.
+            draft = f"ERROR: {type(error).__name__}: {error}"
 
     return {
         "message_id": message_id,
@@ -151,6 +530,72 @@ async def generate_response_for_message(message_id: str):
     }
 
 
+@app.post("/generate-response/{message_id}/stream")
+async def stream_response_for_message(message_id: str, regenerate: bool = False):
+    """Stream a draft response as NDJSON while the LLM generates it.
+
+    Each line is ``{"message_id", "delta"}``; the last line has ``done`` set
+    along with the full draft and server-side timings. If generation fails
+    part-way, the last line carries ``error`` and an empty draft instead.
+    """
+    row = get_actionable_row(message_id)
+    if regenerate or not row["draft_response"]:
+        require_builder()
+
+    def joined(future):
+        yield future.result()
+
+    def events():
+        start = time.perf_counter()
+        first_token = None
+        parts = []
+        error = None
+
+        owned = False
+        if row["draft_response"] and not regenerate:
+            chunks = iter([row["draft_response"]])
+        else:
+            # Share the draft with a queued or running generation of this
+            # message instead of calling the LLM twice.
+            future, owned = draft_queue.claim(row)
+            chunks = get_client().stream_chat(build_prompt(row), refresh=regenerate) if owned else joined(future)
+
+        try:
+            for delta in chunks:
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                parts.append(delta)
+                yield json.dumps({"message_id": message_id, "delta": delta}) + "\n"
+        except Exception as exc:
+            # The deltas sent so far are not a draft; nothing is stored.
+            error = f"{type(exc).__name__}: {exc}"
+            if owned:
+                draft_queue.fail(message_id, exc)
+        except BaseException:
+            # The client went away mid-stream; let a worker finish the draft.
+            if owned:
+                draft_queue.release(row, refresh=regenerate)
+            raise
+
+        draft = "" if error else "".join(parts)
+        total = time.perf_counter() - start
+        if owned and not error:
+            draft_queue.resolve(message_id, draft)
+        print(f"Streamed draft for {message_id}: first token {first_token or total:.2f}s, total {total:.2f}s")
+
+        yield json.dumps({
+            "message_id": message_id,
+            "tag": row["action_bucket"],
+            "done": True,
+            "draft_response": draft,
+            **({"error": error} if error else {}),
+            "time_to_first_token_ms": round((first_token or total) * 1000, 1),
+            "total_ms": round(total * 1000, 1),
+        }) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
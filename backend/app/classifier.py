@@ -0,0 +1,177 @@
+import time
+
+import numpy as np
+from config import CLASSIFY_BATCH_SIZE, ID2LABEL, INFERENCE_BACKEND, MODEL_PATH, WARMUP_BATCH_SIZE
+from embedding_cache import EmbeddingCache, text_key
+from metrics import registry, span, timed
+
+
+INFERENCE_BACKENDS = ("torch", "onnx", "onnx-int8", "packed", "packed-int8")
+
+MODEL_LOAD_SECONDS = registry.gauge("model_load_seconds", "Time taken by the last model load.", ("backend",))
+ENCODE_BATCH_SECONDS = registry.histogram("classify_encode_batch_seconds", "Encoder latency per micro-batch.")
+CLASSIFY_SECONDS = registry.histogram("classify_seconds", "Latency of a classification call (encoder plus head).")
+CLASSIFIED_ROWS = registry.counter("classify_rows_total", "Messages classified.")
+CLASSIFY_ROWS_PER_SECOND = registry.gauge("classify_rows_per_second", "Throughput of the last classification call.")
+EMBEDDING_CACHE_LOOKUPS = registry.counter("embedding_cache_lookups_total", "Embedding cache lookups.", ("result",))
+
+
+def get_device(backend: str = INFERENCE_BACKEND) -> str:
+    """Best torch device for ``backend``; the ONNX-based backends always run on CPU."""
+    if backend != "torch":
+        return "cpu"
+    import torch
+    if torch.backends.mps.is_available():
+        return "mps"
+    elif torch.cuda.is_available():
+        return "cuda"
+    return "cpu"
+
+
+def load_model(device: str, backend: str = INFERENCE_BACKEND, model_path: str = MODEL_PATH):
+    """Load the classifier for the configured inference backend.
+
+    The ONNX backends need ``models/export_onnx.py`` to have been run and
+    always execute on CPU. The packed backends load the single file written by
+    ``models/pack_model.py`` and import neither torch nor setfit.
+    """
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend!r}, expected one of {INFERENCE_BACKENDS}")
+
+    start = time.perf_counter()
+    with span("model_load", backend=backend):
+        if backend == "torch":
+            from setfit import SetFitModel
+            model = SetFitModel.from_pretrained(model_path)
+            model.to(device)
+        elif backend.startswith("packed"):
+            from packed_model import load_packed
+            model = load_packed(model_path, quantized=backend == "packed-int8")
+        else:
+            from onnx_backend import OnnxSetFitModel
+            model = OnnxSetFitModel.from_pretrained(model_path, quantized=backend == "onnx-int8")
+    MODEL_LOAD_SECONDS.set(time.perf_counter() - start, backend=backend)
+    return model
+
+
+def message_text(row: dict) -> str:
+    """The text the classifier sees for a message row."""
+    return f"{row['subject_or_topic']}: {row['message_snippet']}"
+
+
+def _to_numpy(values) -> np.ndarray:
+    if hasattr(values, "detach"):
+        values = values.detach().cpu().numpy()
+    return np.asarray(values, dtype=np.float32)
+
+
+def token_lengths(texts: list[str], model) -> list[int]:
+    """Token count per text, falling back to whitespace words without a tokenizer."""
+    if hasattr(model.model_body, "token_lengths"):
+        return model.model_body.token_lengths(texts)
+    tokenizer = getattr(model.model_body, "tokenizer", None)
+    if tokenizer is None:
+        return [len(text.split()) for text in texts]
+    encoded = tokenizer(texts, add_special_tokens=False, truncation=False)
+    return [len(ids) for ids in encoded["input_ids"]]
+
+
+def encode_texts(texts: list[str], model, batch_size: int = CLASSIFY_BATCH_SIZE) -> np.ndarray:
+    """Embed texts with the SetFit body in length-sorted micro-batches.
+
+    Sorting by token length keeps texts of similar size together, so each
+    micro-batch pads to roughly its own length instead of the longest text.
+    Rows are returned in the original order.
+    """
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+
+    lengths = token_lengths(texts, model)
+    order = sorted(range(len(texts)), key=lengths.__getitem__)
+    embeddings = None
+
+    for start in range(0, len(order), batch_size):
+        idx = order[start:start + batch_size]
+        with timed(ENCODE_BATCH_SECONDS):
+            batch = _to_numpy(model.encode([texts[i] for i in idx], batch_size=batch_size))
+        if embeddings is None:
+            embeddings = np.empty((len(texts), batch.shape[1]), dtype=np.float32)
+        embeddings[idx] = batch
+
+    return embeddings
+
+
+def encode_cached(texts: list[str], model, cache: EmbeddingCache | None = None,
+                  batch_size: int = CLASSIFY_BATCH_SIZE) -> np.ndarray:
+    """Embed texts, running the body only on texts missing from ``cache``."""
+    if cache is None or not texts:
+        return encode_texts(texts, model, batch_size=batch_size)
+
+    keys = [text_key(text) for text in texts]
+    embeddings, misses = cache.lookup(keys)
+
+    if misses:
+        # Identical texts share a key, so each one is encoded only once.
+        first_seen = {}
+        for pos in misses:
+            first_seen.setdefault(keys[pos], pos)
+        fresh = encode_texts([texts[pos] for pos in first_seen.values()], model, batch_size=batch_size)
+        cache.store(list(first_seen), fresh)
+        row_of = {key: row for row, key in enumerate(first_seen)}
+        embeddings[misses] = fresh[[row_of[keys[pos]] for pos in misses]]
+
+    cache.flush()
+    EMBEDDING_CACHE_LOOKUPS.inc(len(texts) - len(misses), result="hit")
+    EMBEDDING_CACHE_LOOKUPS.inc(len(misses), result="miss")
+    print(f"Embedding cache: {len(texts) - len(misses)} hits, {len(misses)} encoded")
+    return embeddings
+
+
+def warm_up(model, batch_size: int = WARMUP_BATCH_SIZE):
+    """Run one throwaway batch of short to long texts through the body and head.
+
+    The first inference pays for lazy initialisation (allocator pools, kernel
+    selection, tokenizer caches); doing it here keeps it off the first request.
+    """
+    if batch_size <= 0:
+        return
+    texts = [" ".join(["warm-up"] * 4 ** (i % 4 + 1)) for i in range(batch_size)]
+    head_proba(model, _to_numpy(model.encode(texts, batch_size=batch_size)))
+
+
+def head_proba(model, embeddings: np.ndarray) -> np.ndarray:
+    """Run only the classification head on precomputed body embeddings."""
+    if getattr(model, "has_differentiable_head", False):
+        import torch
+        embeddings = torch.from_numpy(embeddings)
+    return _to_numpy(model.model_head.predict_proba(embeddings))
+
+
+def head_classes(model, n_classes: int) -> np.ndarray:
+    classes = getattr(model.model_head, "classes_", None)
+    return np.asarray(classes) if classes is not None else np.arange(n_classes)
+
+
+def predict_texts(texts: list[str], model, cache: EmbeddingCache | None = None,
+                  batch_size: int = CLASSIFY_BATCH_SIZE) -> tuple[list[str], list[float]]:
+    """Return (label, confidence) per text from a single encoder pass."""
+    if not texts:
+        return [], []
+
+    start = time.perf_counter()
+    with span("classify", rows=len(texts)):
+        embeddings = encode_cached(texts, model, cache=cache, batch_size=batch_size)
+        probabilities = head_proba(model, embeddings)
+    elapsed = time.perf_counter() - start
+
+    classes = head_classes(model, probabilities.shape[1])
+    best = probabilities.argmax(axis=1)
+    labels = [ID2LABEL[int(classes[i])] for i in best]
+    confidences = probabilities[np.arange(len(best)), best].astype(float).tolist()
+
+    rate = len(texts) / elapsed if elapsed > 0 else float("inf")
+    CLASSIFY_SECONDS.observe(elapsed)
+    CLASSIFIED_ROWS.inc(len(texts))
+    CLASSIFY_ROWS_PER_SECOND.set(rate)
+    print(f"Classified {len(texts)} messages in {elapsed:.2f}s ({rate:.1f} rows/sec)")
+    return labels, confidences
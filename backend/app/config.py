@@ -1,12 +1,77 @@
+import json
 import os
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 MODEL_PATH = os.path.join(BASE_DIR, "models", "message_classifier_model")
+ONNX_DIR = os.path.join(MODEL_PATH, "onnx")
+# "torch" (fp32 SetFit), "onnx" (fp32 ONNX Runtime) or "onnx-int8" (dynamically quantized).
+# "packed" / "packed-int8" run the same ONNX bodies from one file built by models/pack_model.py.
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
 DATA_DIR = os.path.join(BASE_DIR, "data")
+CSV_MESSAGES_PATH = os.path.join(DATA_DIR, "your_messages.csv")
+PARQUET_MESSAGES_PATH = os.path.join(DATA_DIR, "your_messages.parquet")
+
+
+def _default_messages_path() -> str:
+    # The Parquet copy written by message_io.py is only used while it is at
+    # least as new as the CSV, so editing the CSV is never silently ignored.
+    if not os.path.exists(PARQUET_MESSAGES_PATH):
+        return CSV_MESSAGES_PATH
+    if not os.path.exists(CSV_MESSAGES_PATH):
+        return PARQUET_MESSAGES_PATH
+    newer = os.path.getmtime(PARQUET_MESSAGES_PATH) >= os.path.getmtime(CSV_MESSAGES_PATH)
+    return PARQUET_MESSAGES_PATH if newer else CSV_MESSAGES_PATH
+
+
+MESSAGES_PATH = os.getenv("MESSAGES_PATH") or _default_messages_path()
+PROCESSED_MESSAGES_PATH = os.getenv("PROCESSED_MESSAGES_PATH", os.path.join(DATA_DIR, "processed_messages.parquet"))
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
 OLLAMA_URL = f"{OLLAMA_HOST}/api/chat"
 OLLAMA_MODEL = "gpt-oss:20b"
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", "0.5"))
+# Ollama generation options (temperature, seed, num_ctx, ...) as a JSON object.
+OLLAMA_OPTIONS = json.loads(os.getenv("OLLAMA_OPTIONS", "{}"))
+DRAFT_CACHE_PATH = os.getenv("DRAFT_CACHE_PATH", os.path.join(DATA_DIR, "draft_cache.sqlite3"))
+DRAFT_CACHE_MAX_BYTES = int(os.getenv("DRAFT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
 ACTIONABLE_BUCKETS = ["requires_response", "requires_decision"]
+# Actionable messages at least this cosine-similar to an earlier one in the same
+# bucket reuse its draft instead of calling the LLM. Set above 1 to disable.
+DRAFT_REUSE_THRESHOLD = float(os.getenv("DRAFT_REUSE_THRESHOLD", "0.93"))
+# Background drafts are packed this many messages to an LLM request; 1 disables packing.
+DRAFT_BATCH_SIZE = int(os.getenv("DRAFT_BATCH_SIZE", "8"))
+
+# "standalone" serves on its own. "builder" also publishes classified-and-drafted
+# snapshots that "worker" processes serve without loading the model.
+API_MODE = os.getenv("API_MODE", "standalone")
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(DATA_DIR, "snapshots"))
+SNAPSHOT_PUBLISH_SECONDS = float(os.getenv("SNAPSHOT_PUBLISH_SECONDS", "5"))
+SNAPSHOT_POLL_SECONDS = float(os.getenv("SNAPSHOT_POLL_SECONDS", "1"))
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "3"))
+
+CLASSIFY_BATCH_SIZE = int(os.getenv("CLASSIFY_BATCH_SIZE", "32"))
+# Texts in the throwaway batch run before the API reports ready; 0 skips warm-up.
+WARMUP_BATCH_SIZE = int(os.getenv("WARMUP_BATCH_SIZE", "8"))
+# Rows read, classified and drafted at a time by ``pipeline.py --stream``.
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "1000"))
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join(DATA_DIR, "embedding_cache"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+EMBEDDING_CACHE_MAX_AGE_DAYS = float(os.getenv("EMBEDDING_CACHE_MAX_AGE_DAYS", "30"))
+
+# Slack messages posted to /slack/ingest are classified in micro-batches of up to
+# SLACK_BATCH_SIZE, or whatever arrived within SLACK_BATCH_WAIT_SECONDS. At most
+# SLACK_QUEUE_CAPACITY messages wait; beyond that senders get 429 after
+# SLACK_ENQUEUE_TIMEOUT seconds.
+SLACK_BATCH_SIZE = int(os.getenv("SLACK_BATCH_SIZE", str(CLASSIFY_BATCH_SIZE)))
+SLACK_BATCH_WAIT_SECONDS = float(os.getenv("SLACK_BATCH_WAIT_SECONDS", "0.5"))
+SLACK_QUEUE_CAPACITY = int(os.getenv("SLACK_QUEUE_CAPACITY", "1000"))
+SLACK_ENQUEUE_TIMEOUT = float(os.getenv("SLACK_ENQUEUE_TIMEOUT", "2"))
+
+# Label fixes posted to /labels/corrections; the head is refit on these plus the few-shot examples.
+CORRECTIONS_PATH = os.getenv("CORRECTIONS_PATH", os.path.join(DATA_DIR, "label_corrections.json"))
+EXAMPLES_PATH = os.path.join(BASE_DIR, "models", "examples.py")
 
 ID2LABEL = {
     0: "requires_response",
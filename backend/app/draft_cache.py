@@ -0,0 +1,87 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from config import DRAFT_CACHE_MAX_BYTES, DRAFT_CACHE_PATH
+
+
+def prompt_fingerprint(prompt: str, model: str, options: dict) -> str:
+    """Key a draft by everything that determines the LLM output."""
+    payload = json.dumps({"prompt": prompt, "model": model, "options": options}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DraftCache:
+    """Durable draft store in SQLite.
+
+    Drafts are evicted least recently used first once their combined size
+    exceeds ``max_bytes``.
+    """
+
+    def __init__(self, path: str = DRAFT_CACHE_PATH, max_bytes: int = DRAFT_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS drafts ("
+            " key TEXT PRIMARY KEY, draft TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS drafts_last_used ON drafts (last_used)")
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM drafts").fetchone()[0]
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT draft FROM drafts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE drafts SET last_used = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def put(self, key: str, draft: str):
+        size = len(draft.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                old = self._conn.execute("SELECT size FROM drafts WHERE key = ?", (key,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO drafts (key, draft, size, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (key, draft, size, now, now),
+                )
+                self._size += size - (old[0] if old else 0)
+                self._evict()
+                self._conn.execute("COMMIT")
+            except Exception:
+                # Never leave the shared connection inside an open transaction.
+                self._conn.execute("ROLLBACK")
+                self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM drafts").fetchone()[0]
+                raise
+
+    def _evict(self):
+        while self._size > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM drafts ORDER BY last_used LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self._size <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM drafts WHERE key = ?", (key,))
+                self._size -= size
+
+    def clear(self) -> int:
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM drafts").rowcount
+            self._size = 0
+            return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM drafts").fetchone()[0]
+        return {"entries": count, "bytes": self._size, "max_bytes": self.max_bytes}
@@ -0,0 +1,236 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+from config import DRAFT_BATCH_SIZE, LLM_CONCURRENCY
+from metrics import registry, timed
+
+PRIORITY_RANK = {"urgent": 0, "high": 1, "medium": 2, "low": 3}
+URGENT_RANK = -1
+
+QUEUE_DEPTH = registry.gauge("draft_queue_depth", "Drafts waiting for or running on a worker.", ("state",))
+QUEUE_WAIT_SECONDS = registry.histogram("draft_queue_wait_seconds", "Time from submit until a worker picks a draft up.")
+DRAFT_SECONDS = registry.histogram(
+    "draft_generate_seconds", "Draft generation latency per worker request (one message or a packed batch).",
+)
+
+
+def priority_key(row: dict) -> tuple[int, float]:
+    """Sort key putting the highest CSV priority, then the most confident classification, first."""
+    rank = PRIORITY_RANK.get(str(row.get("priority", "")).lower(), len(PRIORITY_RANK))
+    return rank, -float(row.get("classification_confidence") or 0.0)
+
+
+class DraftQueue:
+    """Background draft generation ordered by message priority.
+
+    Workers always take the most urgent message next: on-demand requests
+    first, then the CSV ``priority`` (urgent to low), then the highest
+    ``classification_confidence``. A message has at most one generation
+    pending or running, and every caller asking for it shares that future.
+
+    With ``generate_batch``, a worker that picks up a background draft also
+    takes up to ``batch_size - 1`` more queued background drafts and generates
+    them in one call. Urgent and refresh requests are always generated alone.
+    """
+
+    def __init__(self, generate: Callable[[dict, bool], str], on_result: Callable[[str, str], None],
+                 workers: int = LLM_CONCURRENCY,
+                 generate_batch: Callable[[list[dict]], list[str]] | None = None,
+                 batch_size: int = DRAFT_BATCH_SIZE):
+        self._generate = generate
+        self._generate_batch = generate_batch
+        self._batch_size = batch_size if generate_batch is not None else 1
+        self._on_result = on_result
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._futures: dict[str, Future] = {}
+        self._running: set[str] = set()
+        self._submitted_at: dict[str, float] = {}
+        self._closed = False
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+
+        self._threads = [
+            threading.Thread(target=self._work, name=f"draft-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _sort_key(self, row: dict, urgent: bool) -> tuple:
+        rank, confidence = priority_key(row)
+        return (URGENT_RANK if urgent else rank, confidence, next(self._seq))
+
+    def submit(self, row: dict, urgent: bool = False, refresh: bool = False) -> Future:
+        """Queue a draft for ``row``, or return the generation already in flight.
+
+        Submitting an already queued message with ``urgent=True`` moves it to
+        the front of the queue. ``refresh`` is passed to ``generate`` to bypass
+        any cached draft.
+        """
+        message_id = row["message_id"]
+        with self._cond:
+            future = self._futures.get(message_id)
+            if future is not None and (not urgent or message_id in self._running):
+                return future
+            if future is None:
+                future = Future()
+                self._futures[message_id] = future
+                self._submitted_at[message_id] = time.perf_counter()
+                self.submitted += 1
+            # An urgent resubmit leaves a stale entry behind; workers skip it.
+            heapq.heappush(self._heap, (*self._sort_key(row, urgent), message_id, row, refresh))
+            self._update_depth()
+            self._cond.notify()
+            return future
+
+    def _pop(self) -> tuple[str, dict, bool, Future] | None:
+        """Claim the top heap entry, or return None if it is stale."""
+        *_, message_id, row, refresh = heapq.heappop(self._heap)
+        future = self._futures.get(message_id)
+        if future is None or message_id in self._running:
+            return None
+        self._running.add(message_id)
+        QUEUE_WAIT_SECONDS.observe(time.perf_counter() - self._submitted_at.pop(message_id))
+        return message_id, row, refresh, future
+
+    def _batchable(self, entry: tuple) -> bool:
+        return entry[0] != URGENT_RANK and not entry[-1]
+
+    def _next(self) -> list[tuple[str, dict, bool, Future]] | None:
+        with self._cond:
+            while True:
+                while not self._heap and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return None
+                if not self._batchable(self._heap[0]):
+                    item = self._pop()
+                    if item is None:
+                        continue
+                    self._update_depth()
+                    return [item]
+                batch = []
+                while self._heap and len(batch) < self._batch_size and self._batchable(self._heap[0]):
+                    item = self._pop()
+                    if item is not None:
+                        batch.append(item)
+                if batch:
+                    self._update_depth()
+                    return batch
+
+    def _work(self):
+        while (batch := self._next()) is not None:
+            try:
+                with timed(DRAFT_SECONDS):
+                    if len(batch) == 1:
+                        _, row, refresh, _ = batch[0]
+                        drafts = [self._generate(row, refresh)]
+                    else:
+                        drafts = self._generate_batch([row for _, row, _, _ in batch])
+            except Exception as error:
+                print(f"Draft generation failed for {len(batch)} message(s): {type(error).__name__}: {error}")
+                for message_id, _, _, future in batch:
+                    self._finish(message_id, failed=True)
+                    future.set_exception(error)
+                continue
+
+            for (message_id, _, _, future), draft in zip(batch, drafts):
+                self._complete(message_id, future, draft)
+
+    def _complete(self, message_id: str, future: Future, draft: str):
+        try:
+            self._on_result(message_id, draft)
+        except Exception as error:
+            print(f"Storing draft for {message_id} failed: {type(error).__name__}: {error}")
+            self._finish(message_id, failed=True)
+            future.set_exception(error)
+        else:
+            self._finish(message_id, failed=draft.startswith("ERROR:"))
+            future.set_result(draft)
+
+    def claim(self, row: dict) -> tuple[Future, bool]:
+        """Take over the generation of ``row`` from the workers, or join the one running.
+
+        Returns the message's future and whether the caller now owns the
+        generation. Workers skip a claimed message, and everyone submitting it
+        meanwhile shares the future. An owner must finish with ``resolve`` or
+        ``fail``, or hand the work back with ``release``.
+        """
+        message_id = row["message_id"]
+        with self._cond:
+            future = self._futures.get(message_id)
+            if future is not None and message_id in self._running:
+                return future, False
+            if future is None:
+                future = Future()
+                self._futures[message_id] = future
+                self.submitted += 1
+            else:
+                QUEUE_WAIT_SECONDS.observe(time.perf_counter() - self._submitted_at.pop(message_id))
+            self._running.add(message_id)
+            self._update_depth()
+            return future, True
+
+    def resolve(self, message_id: str, draft: str):
+        """Publish the draft for a claimed message."""
+        with self._cond:
+            future = self._futures[message_id]
+        self._complete(message_id, future, draft)
+
+    def fail(self, message_id: str, error: Exception):
+        """Fail a claimed message; nothing is passed to ``on_result``."""
+        with self._cond:
+            future = self._futures[message_id]
+        self._finish(message_id, failed=True)
+        future.set_exception(error)
+
+    def release(self, row: dict, refresh: bool = False):
+        """Hand a claimed, unfinished generation back to the workers at the front of the queue."""
+        message_id = row["message_id"]
+        with self._cond:
+            self._running.discard(message_id)
+            self._submitted_at[message_id] = time.perf_counter()
+            heapq.heappush(self._heap, (*self._sort_key(row, True), message_id, row, refresh))
+            self._update_depth()
+            self._cond.notify()
+
+    def _finish(self, message_id: str, failed: bool):
+        with self._cond:
+            self._running.discard(message_id)
+            self._futures.pop(message_id, None)
+            self.completed += 1
+            if failed:
+                self.failed += 1
+            self._update_depth()
+
+    def _update_depth(self):
+        in_flight = len(self._running)
+        QUEUE_DEPTH.set(in_flight, state="in_flight")
+        QUEUE_DEPTH.set(len(self._futures) - in_flight, state="queued")
+
+    def progress(self) -> dict:
+        with self._cond:
+            in_flight = len(self._running)
+            return {
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "in_flight": in_flight,
+                "queued": len(self._futures) - in_flight,
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            for message_id, future in self._futures.items():
+                if message_id not in self._running:
+                    future.cancel()
+            self._cond.notify_all()
@@ -0,0 +1,128 @@
+import re
+import threading
+
+import numpy as np
+from config import DRAFT_REUSE_THRESHOLD
+from classifier import encode_cached, message_text
+from embedding_cache import EmbeddingCache
+from metrics import registry
+
+# Per-recipient fields swapped into a reused draft.
+PERSONAL_FIELDS = ("sender_name", "sender_handle_or_email", "order_id")
+
+DIGIT_RUN = re.compile(r"\d+")
+
+DRAFT_REUSE = registry.counter("draft_reuse_total", "Follower drafts adapted from a cluster leader.", ("outcome",))
+
+
+def embed_rows(rows: list[dict], model, cache: EmbeddingCache | None = None) -> np.ndarray:
+    """Classifier embeddings for message rows; the classification pass has usually cached them."""
+    return encode_cached([message_text(row) for row in rows], model, cache=cache)
+
+
+def _first_name(name: str) -> str:
+    return name.split()[0] if name.split() else ""
+
+
+def _substitutions(leader: dict, follower: dict) -> list[tuple[str, str]]:
+    pairs = []
+    for field in PERSONAL_FIELDS:
+        old, new = str(leader.get(field) or ""), str(follower.get(field) or "")
+        if old and old != new:
+            pairs.append((old, new))
+    old, new = _first_name(str(leader.get("sender_name") or "")), _first_name(str(follower.get("sender_name") or ""))
+    if old and old != new:
+        pairs.append((old, new))
+    # Full names before first names, so "Jane Doe" is not half-replaced via "Jane".
+    return sorted(pairs, key=lambda pair: len(pair[0]), reverse=True)
+
+
+def _digit_runs(row: dict) -> set[str]:
+    """Numbers in a message's personal fields and text (order numbers, amounts, dates)."""
+    fields = [str(row.get(field) or "") for field in PERSONAL_FIELDS]
+    return set(DIGIT_RUN.findall(" ".join([*fields, message_text(row)])))
+
+
+def adapt_draft(draft: str, leader: dict, follower: dict) -> str | None:
+    """Rewrite the leader's draft for ``follower``, or None if it can't be personalised.
+
+    A draft that mentions a leader detail the follower has no value for (an
+    order ID, say) would be wrong for the follower, so it is not reused. The
+    same goes for any number from the leader's message that the follower's
+    message doesn't share: the text often writes an order ID differently
+    from the ``order_id`` column ("order 10234" for "ORD-2025-10234").
+    """
+    if not draft or draft.startswith("ERROR:"):
+        return None
+    for old, new in _substitutions(leader, follower):
+        pattern = re.compile(rf"(?<!\w){re.escape(old)}(?!\w)")
+        if not pattern.search(draft):
+            continue
+        if not new:
+            DRAFT_REUSE.inc(outcome="fallback")
+            return None
+        draft = pattern.sub(lambda _: new, draft)
+    if set(DIGIT_RUN.findall(draft)) & (_digit_runs(leader) - _digit_runs(follower)):
+        DRAFT_REUSE.inc(outcome="fallback")
+        return None
+    DRAFT_REUSE.inc(outcome="reused")
+    return draft
+
+
+class DraftReuse:
+    """Groups near-duplicate actionable messages behind one cluster leader.
+
+    A message joins the first leader in its ``action_bucket`` whose embedding
+    has cosine similarity of at least ``threshold``; otherwise it becomes a
+    leader itself. Leaders are kept across calls so later messages can reuse
+    drafts of earlier ones.
+    """
+
+    def __init__(self, threshold: float = DRAFT_REUSE_THRESHOLD):
+        self.threshold = threshold
+        self._leaders: dict[str, list[dict]] = {}
+        # Leader embeddings per bucket, in a buffer that doubles when full.
+        self._vectors: dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self.followers = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold <= 1
+
+    def assign(self, rows: list[dict], embeddings: np.ndarray) -> list[dict | None]:
+        """Return each row's leader, or None for rows that lead (or reuse is off)."""
+        if not self.enabled or not rows:
+            return [None] * len(rows)
+
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        unit = embeddings / np.maximum(norms, 1e-12)
+        assigned = []
+        with self._lock:
+            for row, vector in zip(rows, unit):
+                bucket = row["action_bucket"]
+                leaders = self._leaders.setdefault(bucket, [])
+                if leaders:
+                    similarity = self._vectors[bucket][:len(leaders)] @ vector
+                    best = int(similarity.argmax())
+                    if similarity[best] >= self.threshold:
+                        assigned.append(leaders[best])
+                        self.followers += 1
+                        continue
+                self._append_vector(bucket, len(leaders), vector)
+                leaders.append(row)
+                assigned.append(None)
+        return assigned
+
+    def _append_vector(self, bucket: str, count: int, vector: np.ndarray):
+        buffer = self._vectors.get(bucket)
+        if buffer is None or count == len(buffer):
+            grown = np.empty((max(2 * count, 16), len(vector)), dtype=vector.dtype)
+            if buffer is not None:
+                grown[:count] = buffer[:count]
+            self._vectors[bucket] = buffer = grown
+        buffer[count] = vector
+
+    def progress(self) -> dict:
+        with self._lock:
+            return {"clusters": sum(map(len, self._leaders.values())), "followers": self.followers}
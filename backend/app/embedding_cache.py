@@ -0,0 +1,260 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
+
+import numpy as np
+from filelock import FileLock
+from config import (
+    EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_MAX_AGE_DAYS, EMBEDDING_CACHE_MAX_ENTRIES, INFERENCE_BACKEND, MODEL_PATH,
+)
+from packed_model import PACKED_FILE, PACKED_INT8_FILE, packed_path, read_metadata
+
+INDEX_FILE = "index.sqlite3"
+LOCK_FILE = "cache.lock"
+# Keys per IN (...) query, below SQLite's bound-parameter limit.
+SQLITE_CHUNK = 500
+VECTORS_FILE = "vectors.npy"
+# Files that only affect the classification head, not the body embeddings.
+HEAD_FILES = {"model_head.pkl"}
+# Packed artifacts are fingerprinted from their header instead (see model_fingerprint).
+PACKED_FILES = {PACKED_FILE, PACKED_INT8_FILE}
+ONNX_SUBDIR = "onnx"
+# ONNX model file each backend reads; the other variant is left out of its fingerprint.
+ONNX_SKIP = {"onnx": "model_int8.onnx", "onnx-int8": "model.onnx"}
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def model_fingerprint(model_path: str = MODEL_PATH, backend: str = INFERENCE_BACKEND) -> str:
+    """Content hash of the saved SetFit body as run by ``backend``.
+
+    The head is left out because embeddings only depend on the body, so a
+    retrained head keeps every cached vector valid. Each backend hashes only
+    the body files it loads, since their embeddings differ slightly.
+    """
+    digest = hashlib.sha256(backend.encode("utf-8"))
+    if backend.startswith("packed"):
+        # pack_model.py stores a hash of the body, so the large file is not reread.
+        metadata = read_metadata(packed_path(model_path, quantized=backend == "packed-int8"))
+        digest.update(metadata["body_sha256"].encode("utf-8"))
+        return digest.hexdigest()[:16]
+    if backend in ONNX_SKIP:
+        model_path = os.path.join(model_path, ONNX_SUBDIR)
+        skip = HEAD_FILES | {ONNX_SKIP[backend]}
+    else:
+        skip = HEAD_FILES | PACKED_FILES
+
+    for root, dirs, files in os.walk(model_path):
+        if root == model_path and backend not in ONNX_SKIP:
+            dirs[:] = [d for d in dirs if d != ONNX_SUBDIR]
+        dirs.sort()
+        for name in sorted(files):
+            if name in skip:
+                continue
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, model_path).encode("utf-8"))
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+class EmbeddingCache:
+    """Content-addressed store of body embeddings.
+
+    Vectors live in a fixed-capacity memory-mapped ``.npy`` file, one slot per
+    text. A SQLite index maps the normalized text hash to its slot and
+    last-use time and keeps the list of free slots. Entries unused for
+    ``max_age_days`` are dropped on open, and the least recently used ones
+    are evicted when the file is full.
+
+    Several processes (API workers, the pipeline CLI) may share one cache
+    directory. Every read and write of the index and vectors happens under an
+    exclusive file lock, and slots are only ever handed out by the index, so
+    two processes never claim the same slot.
+    """
+
+    def __init__(self, root: str, fingerprint: str, dim: int,
+                 capacity: int = EMBEDDING_CACHE_MAX_ENTRIES,
+                 max_age_days: float = EMBEDDING_CACHE_MAX_AGE_DAYS):
+        self.dir = os.path.join(root, fingerprint)
+        self.dim = dim
+        self._lock = threading.RLock()
+        os.makedirs(self.dir, exist_ok=True)
+        self._file_lock = FileLock(os.path.join(self.dir, LOCK_FILE))
+        # Last-use times from lookups, written to the index on flush.
+        self._touched: dict[str, float] = {}
+
+        self._conn = sqlite3.connect(os.path.join(self.dir, INDEX_FILE), check_same_thread=False,
+                                     isolation_level=None)
+        with self._locked():
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, slot INTEGER NOT NULL UNIQUE, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS free_slots (slot INTEGER PRIMARY KEY)")
+
+            vectors_path = os.path.join(self.dir, VECTORS_FILE)
+            meta = dict(self._conn.execute("SELECT name, value FROM meta"))
+            if meta.get("dim") == dim and os.path.exists(vectors_path):
+                # Another process may already have the file mapped, so an
+                # existing cache keeps the capacity it was created with.
+                self.capacity = meta["capacity"]
+                self._vectors = np.load(vectors_path, mmap_mode="r+")
+                self._repair_free_slots()
+            else:
+                self.capacity = capacity
+                self._vectors = self._create(vectors_path)
+            self._evict_expired(max_age_days * 86400)
+
+    def _create(self, vectors_path: str) -> np.ndarray:
+        # Written beside the old file and renamed over it, so a process that
+        # still maps the old file is never truncated under its feet.
+        tmp = f"{vectors_path}.tmp"
+        np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(self.capacity, self.dim)).flush()
+        os.replace(tmp, vectors_path)
+        with self._transaction():
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM free_slots")
+            self._conn.executemany("INSERT INTO free_slots VALUES (?)", ((slot,) for slot in range(self.capacity)))
+            self._conn.execute("DELETE FROM meta")
+            self._conn.executemany("INSERT INTO meta VALUES (?, ?)", [("dim", self.dim), ("capacity", self.capacity)])
+        return np.load(vectors_path, mmap_mode="r+")
+
+    def _repair_free_slots(self):
+        # Indexes written before free slots were tracked have none listed.
+        used, free = self._conn.execute(
+            "SELECT (SELECT COUNT(*) FROM entries), (SELECT COUNT(*) FROM free_slots)"
+        ).fetchone()
+        if used + free == self.capacity:
+            return
+        taken = {slot for slot, in self._conn.execute("SELECT slot FROM entries")}
+        with self._transaction():
+            self._conn.execute("DELETE FROM free_slots")
+            self._conn.executemany(
+                "INSERT INTO free_slots VALUES (?)", ((slot,) for slot in range(self.capacity) if slot not in taken)
+            )
+
+    def __len__(self) -> int:
+        with self._locked():
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    @contextmanager
+    def _locked(self):
+        with self._lock, self._file_lock:
+            yield
+
+    @contextmanager
+    def _transaction(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _slots(self, keys: list[str]) -> dict[str, int]:
+        slots = {}
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), SQLITE_CHUNK):
+            chunk = unique[start:start + SQLITE_CHUNK]
+            slots.update(self._conn.execute(
+                f"SELECT key, slot FROM entries WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ))
+        return slots
+
+    def _evict_expired(self, max_age: float):
+        cutoff = time.time() - max_age
+        with self._transaction():
+            self._conn.execute("INSERT INTO free_slots SELECT slot FROM entries WHERE last_used < ?", (cutoff,))
+            self._conn.execute("DELETE FROM entries WHERE last_used < ?", (cutoff,))
+
+    def _reserve(self, count: int) -> list[int]:
+        """Free slots for ``count`` new entries, evicting the least recently used if needed."""
+        free = [slot for slot, in self._conn.execute("SELECT slot FROM free_slots LIMIT ?", (count,))]
+        shortfall = count - len(free)
+        if shortfall > 0:
+            # Committed before any slot is overwritten so a crash can never
+            # leave the index pointing at another text's vector.
+            with self._transaction():
+                oldest = self._conn.execute(
+                    "SELECT key, slot FROM entries ORDER BY last_used LIMIT ?", (shortfall,)
+                ).fetchall()
+                self._conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in oldest])
+                self._conn.executemany("INSERT INTO free_slots VALUES (?)", [(slot,) for _, slot in oldest])
+            free += [slot for _, slot in oldest]
+        return free
+
+    def lookup(self, keys: list[str]) -> tuple[np.ndarray, list[int]]:
+        """Return an array with cached rows filled in, plus the positions that missed."""
+        out = np.zeros((len(keys), self.dim), dtype=np.float32)
+        now = time.time()
+        hit_positions, hit_slots, misses = [], [], []
+
+        with self._locked():
+            slots = self._slots(keys)
+            for i, key in enumerate(keys):
+                slot = slots.get(key)
+                if slot is None:
+                    misses.append(i)
+                    continue
+                self._touched[key] = now
+                hit_positions.append(i)
+                hit_slots.append(slot)
+
+            if hit_positions:
+                out[hit_positions] = self._vectors[hit_slots]
+        return out, misses
+
+    def store(self, keys: list[str], vectors: np.ndarray):
+        # Anything beyond capacity would only evict what was just written.
+        keys, vectors = keys[-self.capacity:], vectors[-self.capacity:]
+        now = time.time()
+        with self._locked():
+            existing = self._slots(keys)
+            # Another process may have stored some of these texts already.
+            new = {key: vector for key, vector in zip(keys, vectors) if key not in existing}
+            if not new:
+                return
+            slots = self._reserve(len(new))
+            for slot, vector in zip(slots, new.values()):
+                self._vectors[slot] = vector
+            # Vectors reach disk before the index rows that point at them.
+            self._vectors.flush()
+            with self._transaction():
+                self._conn.executemany("DELETE FROM free_slots WHERE slot = ?", [(slot,) for slot in slots])
+                self._conn.executemany(
+                    "INSERT INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                    [(key, slot, now) for key, slot in zip(new, slots)],
+                )
+
+    def flush(self):
+        """Write the last-use times of looked-up entries to the index."""
+        with self._locked():
+            if not self._touched:
+                return
+            with self._transaction():
+                self._conn.executemany(
+                    "UPDATE entries SET last_used = MAX(last_used, ?) WHERE key = ?",
+                    [(used_at, key) for key, used_at in self._touched.items()],
+                )
+            self._touched.clear()
+
+
+def open_embedding_cache(model, model_path: str = MODEL_PATH, backend: str = INFERENCE_BACKEND) -> EmbeddingCache:
+    dim = model.model_body.get_sentence_embedding_dimension()
+    return EmbeddingCache(EMBEDDING_CACHE_DIR, model_fingerprint(model_path, backend), dim)
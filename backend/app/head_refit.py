@@ -0,0 +1,107 @@
+import copy
+import json
+import os
+import runpy
+import time
+
+import numpy as np
+from config import CORRECTIONS_PATH, EXAMPLES_PATH, ID2LABEL, LABEL2ID
+from classifier import encode_cached, head_classes, head_proba, message_text
+from embedding_cache import EmbeddingCache
+from metrics import registry
+
+REFIT_SECONDS = registry.histogram("head_refit_seconds", "Time to refit the classification head.")
+# Rows keeping their label are only rewritten if their confidence moved by more than this.
+CONFIDENCE_TOLERANCE = 0.01
+
+
+def load_examples(path: str = EXAMPLES_PATH) -> list[dict]:
+    return runpy.run_path(path)["FEW_SHOT_EXAMPLES"]
+
+
+def load_corrections(path: str = CORRECTIONS_PATH) -> dict[str, dict]:
+    """Saved corrections keyed by message_id, each ``{"text": ..., "label": ...}``."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_corrections(corrections: dict[str, dict], path: str = CORRECTIONS_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(corrections, f, indent=1)
+    os.replace(tmp, path)
+
+
+def refit_head(model, corrections: dict[str, dict], cache: EmbeddingCache | None = None,
+               examples: list[dict] | None = None):
+    """Return a copy of ``model`` whose logistic head is refit on the examples plus ``corrections``.
+
+    Only the head is trained, on body embeddings that are mostly already in
+    the embedding cache. The body is shared with ``model``, which is left
+    untouched so callers can swap the copy in with a single assignment.
+    """
+    if getattr(model, "has_differentiable_head", False):
+        raise ValueError("Head refit needs the scikit-learn head, not the differentiable one")
+    from sklearn.base import clone
+    from sklearn.linear_model import LogisticRegression
+
+    start = time.perf_counter()
+    # A correction for the same text overrides the few-shot label.
+    labels = {example["text"]: example["label"] for example in examples or load_examples()}
+    labels.update({correction["text"]: correction["label"] for correction in corrections.values()})
+    texts = list(labels)
+
+    if hasattr(model.model_head, "get_params"):
+        head = clone(model.model_head)
+    else:
+        # A packed NumPy head keeps the constructor arguments it was trained with.
+        head = LogisticRegression(**model.model_head.params)
+    head.fit(encode_cached(texts, model, cache=cache), [LABEL2ID[labels[text]] for text in texts])
+    refit = copy.copy(model)
+    refit.model_head = head
+
+    elapsed = time.perf_counter() - start
+    REFIT_SECONDS.observe(elapsed)
+    print(f"Refit head on {len(texts)} examples ({len(corrections)} corrections) in {elapsed * 1000:.0f}ms")
+    return refit
+
+
+def apply_saved_corrections(model, cache: EmbeddingCache | None = None):
+    """Refit the head if corrections were saved by an earlier run; otherwise return ``model``."""
+    corrections = load_corrections()
+    return refit_head(model, corrections, cache=cache) if corrections else model
+
+
+def relabel(rows: list[dict], model, corrections: dict[str, dict],
+            cache: EmbeddingCache | None = None) -> list[dict]:
+    """Rerun only the head over ``rows`` and return the changed classifications.
+
+    Each change is ``{message_id, action_bucket, classification_confidence}``.
+    Corrected rows take their corrected label with full confidence.
+    """
+    if not rows:
+        return []
+    embeddings = encode_cached([message_text(row) for row in rows], model, cache=cache)
+    probabilities = head_proba(model, embeddings)
+    classes = head_classes(model, probabilities.shape[1])
+    best = probabilities.argmax(axis=1)
+    confidences = probabilities[np.arange(len(best)), best].astype(float).tolist()
+
+    changed = []
+    for row, i, confidence in zip(rows, best, confidences):
+        label = ID2LABEL[int(classes[i])]
+        correction = corrections.get(row["message_id"])
+        if correction is not None:
+            label, confidence = correction["label"], 1.0
+        previous = float(row.get("classification_confidence") or 0.0)
+        if label != row.get("action_bucket") or abs(confidence - previous) > CONFIDENCE_TOLERANCE:
+            changed.append({
+                "message_id": row["message_id"],
+                "action_bucket": label,
+                "classification_confidence": confidence,
+            })
+    return changed
@@ -0,0 +1,254 @@
+import json
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from config import (
+    LLM_CONCURRENCY, LLM_MAX_RETRIES, LLM_RETRY_BACKOFF, LLM_TIMEOUT, OLLAMA_MODEL, OLLAMA_OPTIONS, OLLAMA_URL,
+)
+from draft_cache import DraftCache, prompt_fingerprint
+from metrics import registry, span
+
+# Statuses worth retrying: Ollama returns 503 while a model is still loading.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+LLM_REQUEST_SECONDS = registry.histogram(
+    "llm_request_seconds", "Ollama chat latency including retries.", ("mode", "outcome"),
+)
+LLM_RETRIES = registry.counter("llm_retries_total", "Ollama requests retried.", ("reason",))
+LLM_TOKENS = registry.counter("llm_tokens_total", "Tokens reported by Ollama.", ("kind",))
+LLM_CACHE_LOOKUPS = registry.counter("llm_cache_lookups_total", "Draft cache lookups.", ("result",))
+
+
+def record_usage(data: dict):
+    """Count the prompt and completion tokens from a final Ollama response."""
+    LLM_TOKENS.inc(data.get("prompt_eval_count", 0), kind="prompt")
+    LLM_TOKENS.inc(data.get("eval_count", 0), kind="completion")
+
+
+class StreamError(Exception):
+    """A streamed completion failed; the deltas yielded so far are not a draft."""
+
+
+class OllamaClient:
+    """Ollama chat client shared across threads.
+
+    A single ``requests.Session`` keeps up to ``concurrency`` keep-alive
+    connections open, and the same number of worker threads issue requests.
+    Connection errors, timeouts and retryable statuses are retried with
+    exponential backoff. With a ``cache``, successful drafts are stored under
+    their prompt fingerprint and served from it until ``refresh`` is requested.
+    """
+
+    def __init__(self, url: str = OLLAMA_URL, model: str = OLLAMA_MODEL,
+                 concurrency: int = LLM_CONCURRENCY, timeout: float = LLM_TIMEOUT,
+                 max_retries: int = LLM_MAX_RETRIES, backoff: float = LLM_RETRY_BACKOFF,
+                 options: dict | None = None, cache: DraftCache | None = None):
+        self.url = url
+        self.model = model
+        self.options = OLLAMA_OPTIONS if options is None else options
+        self.cache = cache
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ollama")
+
+    def _payload(self, prompt: str, system: str | None = None) -> dict:
+        messages = [{"role": "system", "content": system}] if system else []
+        messages.append({"role": "user", "content": prompt})
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "stream": False,
+        }
+        if self.options:
+            payload["options"] = self.options
+        return payload
+
+    def cache_key(self, prompt: str) -> str:
+        return prompt_fingerprint(prompt, self.model, self.options)
+
+    def _send(self, payload: dict, stream: bool = False) -> requests.Response:
+        """POST with retries, re-raising the connection error once retries run out."""
+        for attempt in range(self.max_retries + 1):
+            last = attempt == self.max_retries
+            try:
+                response = self.session.post(self.url, json=payload, timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                if last:
+                    raise
+                LLM_RETRIES.inc(reason=type(error).__name__)
+            else:
+                if response.status_code not in RETRY_STATUSES or last:
+                    return response
+                LLM_RETRIES.inc(reason=str(response.status_code))
+                response.close()
+            time.sleep(self.backoff * 2 ** attempt)
+
+    def _post(self, payload: dict) -> dict:
+        try:
+            response = self._send(payload)
+        except (requests.ConnectionError, requests.Timeout) as error:
+            return {"error": f"{type(error).__name__}: {error}"}
+        try:
+            return response.json()
+        except ValueError:
+            return {"error": f"HTTP {response.status_code}"}
+
+    def _cached(self, key: str | None, refresh: bool) -> str | None:
+        if key is None or refresh:
+            return None
+        cached = self.cache.get(key)
+        LLM_CACHE_LOOKUPS.inc(result="miss" if cached is None else "hit")
+        return cached
+
+    def cached(self, prompt: str) -> str | None:
+        """The cached draft for ``prompt``, if there is one."""
+        return self._cached(self.cache_key(prompt), False) if self.cache is not None else None
+
+    def remember(self, prompt: str, draft: str):
+        """Cache a draft produced for ``prompt`` by some other request, e.g. a packed one."""
+        if self.cache is not None:
+            self.cache.put(self.cache_key(prompt), draft)
+
+    def chat(self, prompt: str, refresh: bool = False) -> str:
+        key = self.cache_key(prompt) if self.cache is not None else None
+        cached = self._cached(key, refresh)
+        if cached is not None:
+            return cached
+
+        start = time.perf_counter()
+        with span("llm_chat", model=self.model):
+            data = self._post(self._payload(prompt))
+        outcome = "ok" if "message" in data else "error"
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, mode="chat", outcome=outcome)
+
+        # Debug: print if error
+        if "message" not in data:
+            print(f"Ollama error: {data}")
+            return f"ERROR: {data.get('error', 'Unknown error')}"
+
+        record_usage(data)
+        content = data["message"]["content"]
+        if key is not None:
+            self.cache.put(key, content)
+        return content
+
+    def chat_json(self, prompt: str, system: str | None = None) -> dict | None:
+        """Ask for a JSON object reply (Ollama ``format: json``); None if the call or parsing fails."""
+        payload = self._payload(prompt, system)
+        payload["format"] = "json"
+        start = time.perf_counter()
+        with span("llm_chat_json", model=self.model):
+            data = self._post(payload)
+        outcome = "ok" if "message" in data else "error"
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, mode="json", outcome=outcome)
+
+        if "message" not in data:
+            print(f"Ollama error: {data}")
+            return None
+        record_usage(data)
+        try:
+            parsed = json.loads(data["message"]["content"])
+        except ValueError:
+            return None
+        return parsed if isinstance(parsed, dict) else None
+
+    def stream_chat(self, prompt: str, refresh: bool = False) -> Iterator[str]:
+        """Yield the completion in the chunks Ollama streams it in.
+
+        A cached draft is yielded as a single chunk. A failure raises
+        ``StreamError``, possibly after some deltas were already yielded, so
+        callers must not treat those deltas as a finished draft.
+        """
+        key = self.cache_key(prompt) if self.cache is not None else None
+        cached = self._cached(key, refresh)
+        if cached is not None:
+            yield cached
+            return
+
+        start = time.perf_counter()
+        parts = None
+        try:
+            with span("llm_stream", model=self.model):
+                parts = yield from self._stream(prompt)
+        finally:
+            outcome = "error" if parts is None else "ok"
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, mode="stream", outcome=outcome)
+
+        if key is not None and parts:
+            self.cache.put(key, "".join(parts))
+
+    def _stream(self, prompt: str):
+        """Yield deltas for ``stream_chat`` and return the parts; raise ``StreamError`` on failure."""
+        payload = self._payload(prompt)
+        payload["stream"] = True
+        try:
+            response = self._send(payload, stream=True)
+        except (requests.ConnectionError, requests.Timeout) as error:
+            raise StreamError(f"{type(error).__name__}: {error}") from error
+
+        parts = []
+        with response:
+            if response.status_code != 200:
+                raise StreamError(f"HTTP {response.status_code}")
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    print(f"Ollama error: {chunk}")
+                    raise StreamError(chunk["error"])
+                delta = chunk.get("message", {}).get("content", "")
+                if delta:
+                    parts.append(delta)
+                    yield delta
+                if chunk.get("done"):
+                    record_usage(chunk)
+                    break
+            else:
+                raise StreamError("stream ended before the completion was done")
+        return parts
+
+    def chat_many(self, prompts: list[str], progress: bool = False) -> list[str]:
+        """Run prompts concurrently, returning responses in input order."""
+        return self.map(self.chat, prompts, progress=progress)
+
+    def map(self, function, items: list, progress: bool = False) -> list:
+        """Call ``function`` on each item on the client's worker threads, keeping input order."""
+        futures = {self._executor.submit(function, item): i for i, item in enumerate(items)}
+        results = [None] * len(items)
+
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if progress:
+                print(f"Generated {done}/{len(items)} responses")
+
+        return results
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> OllamaClient:
+    """Process-wide client backed by the draft cache, created on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OllamaClient(cache=DraftCache())
+    return _client
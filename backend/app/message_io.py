@@ -0,0 +1,91 @@
+import json
+import os
+import sys
+from collections.abc import Iterator
+from typing import TYPE_CHECKING
+
+from config import ID2LABEL
+from message_store import df_to_json_safe
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+CATEGORICAL_COLUMNS = ["source_system", "channel_type", "category", "priority"]
+BOOLEAN_COLUMNS = ["sent_to_external"]
+TIMESTAMP_COLUMNS = ["timestamp_utc"]
+
+
+def to_columnar(df: "pd.DataFrame") -> "pd.DataFrame":
+    """Give message columns compact dtypes.
+
+    Low-cardinality text becomes categorical, ``sent_to_external`` becomes
+    bool and ``timestamp_utc`` is parsed to a UTC datetime.
+    """
+    import pandas as pd
+    df = df.copy()
+    for column in CATEGORICAL_COLUMNS:
+        if column in df:
+            df[column] = df[column].astype("category")
+    if "action_bucket" in df:
+        df["action_bucket"] = df["action_bucket"].astype(pd.CategoricalDtype(list(ID2LABEL.values())))
+    for column in BOOLEAN_COLUMNS:
+        if column in df and df[column].dtype != bool:
+            df[column] = df[column].astype(str).str.lower().eq("true")
+    for column in TIMESTAMP_COLUMNS:
+        if column in df:
+            df[column] = pd.to_datetime(df[column], utc=True, errors="coerce")
+    return df
+
+
+def read_messages(path: str) -> "pd.DataFrame":
+    """Load messages from Parquet, or from CSV converted to the same dtypes."""
+    import pandas as pd
+    print(f"Loading messages from {path}")
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return to_columnar(pd.read_csv(path))
+
+
+def write_messages(df: "pd.DataFrame", path: str):
+    """Write messages as Parquet, replacing ``path`` atomically."""
+    tmp = f"{path}.tmp"
+    to_columnar(df).to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def iter_messages(path: str, chunk_size: int, skip: int = 0) -> Iterator["pd.DataFrame"]:
+    """Yield messages ``chunk_size`` rows at a time, after skipping the first ``skip`` rows."""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            if skip >= batch.num_rows:
+                skip -= batch.num_rows
+                continue
+            yield batch.slice(skip).to_pandas()
+            skip = 0
+        return
+    import pandas as pd
+    for chunk in pd.read_csv(path, chunksize=chunk_size, skiprows=range(1, skip + 1)):
+        yield to_columnar(chunk)
+
+
+def append_ndjson(df: "pd.DataFrame", path: str) -> int:
+    """Append messages as one JSON object per line, synced to disk; returns the new file size."""
+    lines = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in df_to_json_safe(df))
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(lines)
+        f.flush()
+        os.fsync(f.fileno())
+        return f.tell()
+
+
+def convert(csv_path: str, parquet_path: str):
+    df = read_messages(csv_path)
+    write_messages(df, parquet_path)
+    print(f"Wrote {len(df)} messages to {parquet_path}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python message_io.py <messages.csv> <messages.parquet>")
+    convert(sys.argv[1], sys.argv[2])
@@ -0,0 +1,216 @@
+import bisect
+import json
+import threading
+from typing import TYPE_CHECKING
+
+from config import ID2LABEL
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def df_to_json_safe(df: "pd.DataFrame") -> list[dict]:
+    """Convert DataFrame to JSON-safe list of dicts, handling NaN, categorical and datetime values."""
+    import pandas as pd
+    df = df.copy()
+    for column, dtype in df.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(object)
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            df[column] = df[column].dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+    return df.fillna("").to_dict(orient="records")
+
+
+def _dumps(value) -> bytes:
+    # Same compact encoding FastAPI's JSONResponse produces.
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _tag_payload(tag: str, count: int, rows: bytes) -> bytes:
+    return b"".join([b'{"tag":', _dumps(tag), b',"count":', str(count).encode(), b',"messages":', rows, b"}"])
+
+
+def _grouped_payload(tag_rows: dict[str, bytes]) -> bytes:
+    return b"{" + b",".join(_dumps(tag) + b":" + rows for tag, rows in tag_rows.items()) + b"}"
+
+
+class MessageStore:
+    """Classified messages indexed for the read endpoints.
+
+    Rows are kept as JSON-safe dicts with a hash index on ``message_id`` and
+    per-tag row groups. Every row also keeps its serialized JSON, and every tag
+    its serialized payload, so reads only return precomputed bytes. Updating a
+    row re-serializes that row and invalidates only the tags it belongs to.
+    ``version`` counts changes so snapshot publishing can skip idle periods.
+    """
+
+    def __init__(self, records: list[dict]):
+        self.version = 0
+        self._lock = threading.RLock()
+        self._records: list[dict] = []
+        self._row_json: list[bytes] = []
+        self._index: dict[str, int] = {}
+        self._tags: dict[str, list[int]] = {tag: [] for tag in ID2LABEL.values()}
+        self._tag_json: dict[str, bytes] = {}
+        self._grouped_json: bytes | None = None
+        self.append(records)
+
+    @classmethod
+    def from_dataframe(cls, df: "pd.DataFrame") -> "MessageStore":
+        return cls(df_to_json_safe(df))
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, message_id: str) -> bool:
+        return message_id in self._index
+
+    def _invalidate(self, tag: str):
+        self._tag_json.pop(tag, None)
+        self._grouped_json = None
+
+    def append(self, records: list[dict]) -> list[str]:
+        """Add new rows, skipping IDs already present. Returns the added IDs."""
+        added = []
+        with self._lock:
+            for record in records:
+                message_id = record["message_id"]
+                if message_id in self._index:
+                    continue
+                pos = len(self._records)
+                self._index[message_id] = pos
+                self._records.append(dict(record))
+                self._row_json.append(_dumps(record))
+                tag = record.get("action_bucket")
+                if tag in self._tags:
+                    self._tags[tag].append(pos)
+                    self._invalidate(tag)
+                added.append(message_id)
+            if added:
+                self.version += 1
+        return added
+
+    def get(self, message_id: str) -> dict | None:
+        with self._lock:
+            pos = self._index.get(message_id)
+            return None if pos is None else dict(self._records[pos])
+
+    def update(self, message_id: str, **fields) -> bool:
+        """Change fields of one row, moving it between tags if its bucket changes."""
+        with self._lock:
+            pos = self._index.get(message_id)
+            if pos is None:
+                return False
+            record = self._records[pos]
+            old_tag = record.get("action_bucket")
+            record.update(fields)
+            self._row_json[pos] = _dumps(record)
+            self.version += 1
+
+            new_tag = record.get("action_bucket")
+            if new_tag != old_tag:
+                if old_tag in self._tags:
+                    self._tags[old_tag].remove(pos)
+                if new_tag in self._tags:
+                    bisect.insort(self._tags[new_tag], pos)
+                    self._invalidate(new_tag)
+            if old_tag in self._tags:
+                self._invalidate(old_tag)
+            return True
+
+    def rows(self, tag: str) -> list[dict]:
+        with self._lock:
+            return [dict(self._records[pos]) for pos in self._tags[tag]]
+
+    def records(self) -> list[dict]:
+        with self._lock:
+            return [dict(record) for record in self._records]
+
+    def serialized(self) -> dict[str, list]:
+        """Columns for a snapshot: ``message_id``, ``action_bucket`` and the serialized ``row_json``."""
+        with self._lock:
+            return {
+                "message_id": [record["message_id"] for record in self._records],
+                "action_bucket": [record.get("action_bucket") for record in self._records],
+                "row_json": list(self._row_json),
+            }
+
+    def to_dataframe(self) -> "pd.DataFrame":
+        import pandas as pd
+        return pd.DataFrame(self.records())
+
+    def count(self, tag: str) -> int:
+        return len(self._tags[tag])
+
+    def _tag_rows(self, tag: str) -> bytes:
+        payload = self._tag_json.get(tag)
+        if payload is None:
+            payload = b"[" + b",".join(self._row_json[pos] for pos in self._tags[tag]) + b"]"
+            self._tag_json[tag] = payload
+        return payload
+
+    def tag_json(self, tag: str) -> bytes:
+        """``{"tag", "count", "messages"}`` for one tag, as JSON bytes."""
+        with self._lock:
+            return _tag_payload(tag, len(self._tags[tag]), self._tag_rows(tag))
+
+    def grouped_json(self) -> bytes:
+        """Every tag mapped to its messages, as JSON bytes."""
+        with self._lock:
+            if self._grouped_json is None:
+                self._grouped_json = _grouped_payload({tag: self._tag_rows(tag) for tag in self._tags})
+            return self._grouped_json
+
+
+class SnapshotStore:
+    """Read-only store over a memory-mapped snapshot table (worker mode).
+
+    Serves the same reads as ``MessageStore`` straight from the builder's
+    serialized ``row_json`` column. The column is read zero-copy from the
+    mapped Arrow file, so it stays in the shared page cache. Workers only
+    keep the ID index and the tag payloads they have served; rows are never
+    rebuilt as dicts or re-serialized.
+    """
+
+    def __init__(self, table):
+        self._lock = threading.Lock()
+        self._row_json = table.column("row_json")
+        self._index = {message_id: pos for pos, message_id in enumerate(table.column("message_id").to_pylist())}
+        self._tags: dict[str, list[int]] = {tag: [] for tag in ID2LABEL.values()}
+        for pos, tag in enumerate(table.column("action_bucket").to_pylist()):
+            if tag in self._tags:
+                self._tags[tag].append(pos)
+        self._tag_json: dict[str, bytes] = {}
+        self._grouped_json: bytes | None = None
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, message_id: str) -> bool:
+        return message_id in self._index
+
+    def get(self, message_id: str) -> dict | None:
+        pos = self._index.get(message_id)
+        return None if pos is None else json.loads(self._row_json[pos].as_py())
+
+    def count(self, tag: str) -> int:
+        return len(self._tags[tag])
+
+    def _tag_rows(self, tag: str) -> bytes:
+        payload = self._tag_json.get(tag)
+        if payload is None:
+            payload = b"[" + b",".join(self._row_json.take(self._tags[tag]).to_pylist()) + b"]"
+            self._tag_json[tag] = payload
+        return payload
+
+    def tag_json(self, tag: str) -> bytes:
+        """``{"tag", "count", "messages"}`` for one tag, as JSON bytes."""
+        with self._lock:
+            return _tag_payload(tag, len(self._tags[tag]), self._tag_rows(tag))
+
+    def grouped_json(self) -> bytes:
+        """Every tag mapped to its messages, as JSON bytes."""
+        with self._lock:
+            if self._grouped_json is None:
+                self._grouped_json = _grouped_payload({tag: self._tag_rows(tag) for tag in self._tags})
+            return self._grouped_json
@@ -0,0 +1,75 @@
+import json
+import os
+
+import numpy as np
+from config import MODEL_PATH, ONNX_DIR
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model_int8.onnx"
+POOLING_FILE = "pooling.json"
+
+
+def mean_pool(hidden: np.ndarray, attention_mask: np.ndarray, normalize: bool) -> np.ndarray:
+    """Sentence-transformers mean pooling over the non-padding tokens."""
+    mask = attention_mask[..., None].astype(np.float32)
+    embeddings = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+    if normalize:
+        embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+    return embeddings.astype(np.float32)
+
+
+class OnnxBody:
+    """Sentence-transformer body exported by models/export_onnx.py, run with ONNX Runtime."""
+
+    def __init__(self, onnx_dir: str = ONNX_DIR, quantized: bool = False):
+        with open(os.path.join(onnx_dir, POOLING_FILE)) as f:
+            self.pooling = json.load(f)
+        if self.pooling["mode"] != "mean":
+            raise ValueError(f"Unsupported pooling mode for ONNX backend: {self.pooling['mode']}")
+
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        self.tokenizer = AutoTokenizer.from_pretrained(onnx_dir)
+        path = os.path.join(onnx_dir, INT8_FILE if quantized else FP32_FILE)
+        self.session = ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.pooling["dimension"]
+
+    def encode(self, texts: list[str], batch_size: int = 32) -> np.ndarray:
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            encoded = self.tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.pooling["max_seq_length"],
+                return_tensors="np",
+            )
+            feeds = {name: encoded[name].astype(np.int64) for name in self.input_names}
+            hidden = self.session.run(None, feeds)[0]
+            batches.append(mean_pool(hidden, encoded["attention_mask"], self.pooling["normalize"]))
+        return np.concatenate(batches)
+
+
+class OnnxSetFitModel:
+    """ONNX body plus the trained logistic head, with the parts of SetFitModel the classifier uses."""
+
+    has_differentiable_head = False
+
+    def __init__(self, model_body: OnnxBody, model_head):
+        self.model_body = model_body
+        self.model_head = model_head
+
+    @classmethod
+    def from_pretrained(cls, model_path: str = MODEL_PATH, quantized: bool = False) -> "OnnxSetFitModel":
+        import joblib
+        head = joblib.load(os.path.join(model_path, "model_head.pkl"))
+        return cls(OnnxBody(os.path.join(model_path, "onnx"), quantized=quantized), head)
+
+    def encode(self, inputs: list[str], batch_size: int = 32) -> np.ndarray:
+        return self.model_body.encode(inputs, batch_size=batch_size)
+
+    def to(self, device: str) -> "OnnxSetFitModel":
+        return self
@@ -0,0 +1,115 @@
+import json
+import os
+
+import numpy as np
+from config import MODEL_PATH
+from onnx_backend import OnnxSetFitModel, mean_pool
+
+PACKED_FILE = "model.packed.safetensors"
+PACKED_INT8_FILE = "model_int8.packed.safetensors"
+FORMAT_VERSION = "1"
+
+
+def packed_path(model_path: str = MODEL_PATH, quantized: bool = False) -> str:
+    return os.path.join(model_path, PACKED_INT8_FILE if quantized else PACKED_FILE)
+
+
+def read_metadata(path: str) -> dict[str, str]:
+    """The artifact's string metadata, read from the safetensors header only."""
+    from safetensors import safe_open
+    with safe_open(path, framework="np") as f:
+        return f.metadata()
+
+
+class LinearHead:
+    """The fitted logistic-regression head as plain NumPy arrays.
+
+    Mirrors the parts of scikit-learn's ``LogisticRegression`` the classifier
+    uses; ``params`` keeps its constructor arguments for refitting.
+    """
+
+    def __init__(self, coef: np.ndarray, intercept: np.ndarray, classes: np.ndarray,
+                 multinomial: bool, params: dict):
+        self.coef_ = coef
+        self.intercept_ = intercept
+        self.classes_ = classes
+        self.multinomial = multinomial
+        self.params = params
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        return np.asarray(X, dtype=np.float64) @ self.coef_.T + self.intercept_
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        scores = self.decision_function(X)
+        if scores.shape[1] == 1:
+            positive = 1.0 / (1.0 + np.exp(-scores))
+            return np.hstack([1.0 - positive, positive])
+        if self.multinomial:
+            scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+        else:
+            scores = 1.0 / (1.0 + np.exp(-scores))
+        return scores / scores.sum(axis=1, keepdims=True)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+class PackedBody:
+    """ONNX body, tokenizer and pooling settings restored from a packed artifact."""
+
+    def __init__(self, graph: bytes, tokenizer_json: str, pooling: dict):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.pooling = pooling
+        self._tokenizer = Tokenizer.from_str(tokenizer_json)
+        self._tokenizer.enable_truncation(pooling["max_seq_length"])
+        self._tokenizer.enable_padding(pad_id=pooling["pad_id"], pad_token=pooling["pad_token"])
+        # A second copy without truncation or padding, for counting tokens.
+        self._counter = Tokenizer.from_str(tokenizer_json)
+        self._counter.no_truncation()
+        self._counter.no_padding()
+        self.session = ort.InferenceSession(graph, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.pooling["dimension"]
+
+    def token_lengths(self, texts: list[str]) -> list[int]:
+        return [len(encoding.ids) for encoding in self._counter.encode_batch(texts, add_special_tokens=False)]
+
+    def encode(self, texts: list[str], batch_size: int = 32) -> np.ndarray:
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self._tokenizer.encode_batch(texts[start:start + batch_size])
+            inputs = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            hidden = self.session.run(None, {name: inputs[name] for name in self.input_names})[0]
+            batches.append(mean_pool(hidden, inputs["attention_mask"], self.pooling["normalize"]))
+        return np.concatenate(batches)
+
+
+def load_packed(model_path: str = MODEL_PATH, quantized: bool = False) -> OnnxSetFitModel:
+    """Load the single-file artifact written by ``models/pack_model.py``.
+
+    Needs only safetensors, tokenizers and ONNX Runtime: no torch, setfit,
+    transformers or scikit-learn import on the startup path.
+    """
+    from safetensors import safe_open
+
+    path = packed_path(model_path, quantized)
+    with safe_open(path, framework="np") as f:
+        metadata = f.metadata()
+        tensors = {name: f.get_tensor(name) for name in f.keys()}
+    if metadata.get("format") != FORMAT_VERSION:
+        raise ValueError(f"{path} has format {metadata.get('format')!r}, expected {FORMAT_VERSION}; rerun pack_model.py")
+
+    body = PackedBody(tensors["body.onnx"].tobytes(), metadata["tokenizer"], json.loads(metadata["pooling"]))
+    head = LinearHead(
+        tensors["head.coef"], tensors["head.intercept"], tensors["head.classes"],
+        multinomial=metadata["head_multi_class"] == "multinomial", params=json.loads(metadata["head_params"]),
+    )
+    return OnnxSetFitModel(body, head)
@@ -1,99 +1,257 @@
-import pandas as pd
-import requests
-import torch
-from setfit import SetFitModel
-from config import MODEL_PATH, OLLAMA_URL, OLLAMA_MODEL, ACTIONABLE_BUCKETS, ID2LABEL
+import argparse
+import json
+import os
+from typing import TYPE_CHECKING
 
+from config import ACTIONABLE_BUCKETS, DRAFT_BATCH_SIZE, INFERENCE_BACKEND, STREAM_CHUNK_SIZE
+from classifier import get_device, load_model, predict_texts
+from draft_reuse import DraftReuse, adapt_draft, embed_rows
+from head_refit import apply_saved_corrections
+from embedding_cache import EmbeddingCache, open_embedding_cache
+from llm_client import OllamaClient, get_client
+from message_io import append_ndjson, iter_messages, read_messages, write_messages
+from metrics import registry
 
-def get_device():
-    if torch.backends.mps.is_available():
-        return "mps"
-    elif torch.cuda.is_available():
-        return "cuda"
-    return "cpu"
+if TYPE_CHECKING:
+    import pandas as pd
 
+PACKED_DRAFTS = registry.counter("llm_packed_drafts_total", "Drafts requested in packed LLM calls.", ("outcome",))
 
-def classify(df: pd.DataFrame, model: SetFitModel) -> pd.DataFrame:
-    df["text_for_classification"] = df["subject_or_topic"] + ": " + df["message_snippet"]
-    
-    predictions = model.predict(df["text_for_classification"].tolist())
-    probabilities = model.predict_proba(df["text_for_classification"].tolist())
-    
-    df["action_bucket"] = [ID2LABEL[int(p)] for p in predictions]
-    df["classification_confidence"] = [float(max(prob)) for prob in probabilities]
-    df = df.drop(columns=["text_for_classification"])
+
+def classify(df: "pd.DataFrame", model, cache: EmbeddingCache | None = None) -> "pd.DataFrame":
+    texts = (df["subject_or_topic"] + ": " + df["message_snippet"]).tolist()
+
+    # One encoder pass yields both the label and its confidence.
+    labels, confidences = predict_texts(texts, model, cache=cache)
+
+    df["action_bucket"] = labels
+    df["classification_confidence"] = confidences
     
     return df
 
 
-def extract_actionable(df: pd.DataFrame) -> pd.DataFrame:
+def extract_actionable(df: "pd.DataFrame") -> "pd.DataFrame":
     return df[df["action_bucket"].isin(ACTIONABLE_BUCKETS)].copy()
 
 
-def generate_response(row: pd.Series) -> str:
-    prompt = f"""You are an assistant helping a small business owner (AuroraSkin, a skincare brand) draft responses.
+ASSISTANT_ROLE = "You are an assistant helping a small business owner (AuroraSkin, a skincare brand) draft responses."
+DRAFT_STYLE = "Be helpful and on-brand for a skincare company. Keep it concise."
 
-Message details:
-- From: {row['sender_name']} ({row['sender_handle_or_email']})
+# Shared instructions for packed requests. They go first, unchanged between
+# requests, so Ollama can reuse the processed prefix from its prompt cache.
+BATCH_INSTRUCTIONS = f"""{ASSISTANT_ROLE}
+
+You will be given several messages. Draft a brief, professional response to each one. {DRAFT_STYLE}
+
+Reply with a single JSON object that maps every message_id to its draft response, for example:
+{{"msg_001": "Hi Jane, ...", "msg_002": "Hello Sam, ..."}}"""
+
+
+def message_details(row: "pd.Series") -> str:
+    return f"""- From: {row['sender_name']} ({row['sender_handle_or_email']})
 - Subject: {row['subject_or_topic']}
 - Message: {row['message_snippet']}
 - Source: {row['source_system']} / {row['channel_name']}
 - Category: {row['category']}
-- Order ID: {row.get('order_id', 'N/A')}
-
-Draft a brief, professional response. Be helpful and on-brand for a skincare company. Keep it concise."""
-
-    response = requests.post(
-        OLLAMA_URL,
-        json={
-            "model": OLLAMA_MODEL,
-            "messages": [{"role": "user", "content": prompt}],
-            "stream": False
-        }
-    )
-    
-    data = response.json()
-    
-    # Debug: print if error
-    if "message" not in data:
-        print(f"Ollama error: {data}")
-        return f"ERROR: {data.get('error', 'Unknown error')}"
-    
-    return data["message"]["content"]
+- Order ID: {row.get('order_id', 'N/A')}"""
 
 
-def process_actionable_messages(df: pd.DataFrame) -> pd.DataFrame:
-    responses = []
-    for _, row in df.iterrows():
-        print(f"Generating response for {row['message_id']}...")
-        responses.append(generate_response(row))
-    
-    df["draft_response"] = responses
+def build_prompt(row: "pd.Series") -> str:
+    return f"""{ASSISTANT_ROLE}
+
+Message details:
+{message_details(row)}
+
+Draft a brief, professional response. {DRAFT_STYLE}"""
+
+
+def build_batch_prompt(rows: list[dict]) -> str:
+    return "\n\n".join(f"message_id: {row['message_id']}\n{message_details(row)}" for row in rows)
+
+
+def generate_response(row: "pd.Series", client: OllamaClient | None = None, refresh: bool = False) -> str:
+    return (client or get_client()).chat(build_prompt(row), refresh=refresh)
+
+
+def generate_batch(rows: list[dict], client: OllamaClient | None = None, refresh: bool = False) -> list[str]:
+    """Draft several messages with one packed request, falling back to one request per message.
+
+    Drafts parsed from the packed reply are cached under each message's own
+    prompt, so later single-message calls are served from the cache.
+    """
+    client = client or get_client()
+    prompts = [build_prompt(row) for row in rows]
+    drafts = [None if refresh else client.cached(prompt) for prompt in prompts]
+    missing = [i for i, draft in enumerate(drafts) if draft is None]
+
+    if len(missing) > 1:
+        reply = client.chat_json(build_batch_prompt([rows[i] for i in missing]), system=BATCH_INSTRUCTIONS) or {}
+        for i in missing:
+            draft = reply.get(str(rows[i]["message_id"]))
+            if isinstance(draft, str) and draft.strip():
+                drafts[i] = draft.strip()
+                client.remember(prompts[i], drafts[i])
+        packed = sum(drafts[i] is not None for i in missing)
+        PACKED_DRAFTS.inc(packed, outcome="packed")
+        PACKED_DRAFTS.inc(len(missing) - packed, outcome="fallback")
+
+    return [draft if draft is not None else client.chat(prompt, refresh=refresh)
+            for draft, prompt in zip(drafts, prompts)]
+
+
+def draft_rows(rows: list[dict], client: OllamaClient, progress: bool = False) -> list[str]:
+    """Draft rows in packed batches of DRAFT_BATCH_SIZE, running batches concurrently."""
+    size = max(1, DRAFT_BATCH_SIZE)
+    batches = [rows[start:start + size] for start in range(0, len(rows), size)]
+    results = client.map(lambda batch: generate_batch(batch, client=client), batches, progress=progress)
+    return [draft for batch in results for draft in batch]
+
+
+def process_actionable_messages(df: "pd.DataFrame", client: OllamaClient | None = None, model=None,
+                                cache: EmbeddingCache | None = None) -> "pd.DataFrame":
+    """Draft a response per row; with ``model``, near-duplicates reuse their cluster leader's draft."""
+    client = client or get_client()
+    rows = df.to_dict("records")
+    reuse = DraftReuse()
+    if model is not None and reuse.enabled:
+        leaders = reuse.assign(rows, embed_rows(rows, model, cache))
+    else:
+        leaders = [None] * len(rows)
+
+    pending = [i for i, leader in enumerate(leaders) if leader is None]
+    print(f"Generating {len(pending)} responses for {len(rows)} messages "
+          f"({client.concurrency} concurrent, {DRAFT_BATCH_SIZE} per request)...")
+    drafts = [""] * len(rows)
+    for i, draft in zip(pending, draft_rows([rows[i] for i in pending], client, progress=True)):
+        drafts[i] = draft
+
+    by_id = {rows[i]["message_id"]: drafts[i] for i in pending}
+    fallback = []
+    for i, leader in enumerate(leaders):
+        if leader is not None:
+            draft = adapt_draft(by_id[leader["message_id"]], leader, rows[i])
+            if draft is None:
+                fallback.append(i)
+            else:
+                drafts[i] = draft
+    if fallback:
+        print(f"Generating {len(fallback)} responses that could not reuse a cluster draft...")
+        for i, draft in zip(fallback, draft_rows([rows[i] for i in fallback], client)):
+            drafts[i] = draft
+
+    df["draft_response"] = drafts
     return df
 
 
-def main(input_csv: str):
+CHECKPOINT_FILE = "pipeline_checkpoint.json"
+PROCESSED_NDJSON = "processed_messages.ndjson"
+ACTIONABLE_NDJSON = "actionable_with_drafts.ndjson"
+
+
+def load_classifier():
     device = get_device()
     print(f"Using device: {device}")
-    
-    print("Loading classifier...")
-    model = SetFitModel.from_pretrained(MODEL_PATH)
-    model.to(device)
+
+    print(f"Loading classifier ({INFERENCE_BACKEND})...")
+    model = load_model(device)
+    cache = open_embedding_cache(model)
+    return apply_saved_corrections(model, cache), cache
+
+
+def main(input_path: str):
+    model, cache = load_classifier()
     
     print("Classifying messages...")
-    df = pd.read_csv(input_csv)
-    df = classify(df, model)
-    df.to_csv("processed_messages.csv", index=False)
+    df = read_messages(input_path)
+    df = classify(df, model, cache=cache)
+    write_messages(df, "processed_messages.parquet")
     
     actionable = extract_actionable(df)
     print(f"\nFound {len(actionable)} actionable messages")
     
     print("\nGenerating draft responses...")
-    actionable = process_actionable_messages(actionable)
-    actionable.to_csv("actionable_with_drafts.csv", index=False)
+    actionable = process_actionable_messages(actionable, model=model, cache=cache)
+    write_messages(actionable, "actionable_with_drafts.parquet")
     
     print("\nDone.")
 
 
+def _input_signature(input_path: str) -> dict:
+    stat = os.stat(input_path)
+    return {"input": os.path.abspath(input_path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def load_checkpoint(input_path: str, output_dir: str, restart: bool = False) -> dict:
+    """Progress of an earlier streaming run over the same input, or a fresh start."""
+    fresh = {**_input_signature(input_path), "rows": 0, "processed_bytes": 0, "actionable_bytes": 0}
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    if restart or not os.path.exists(path):
+        return fresh
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if any(checkpoint.get(key) != value for key, value in _input_signature(input_path).items()):
+        raise ValueError(f"{path} was written for a different input; rerun with --restart")
+    return checkpoint
+
+
+def save_checkpoint(checkpoint: dict, output_dir: str):
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, path)
+
+
+def _truncate(path: str, size: int):
+    with open(path, "a"):
+        pass
+    os.truncate(path, size)
+
+
+def main_streaming(input_path: str, output_dir: str = ".", chunk_size: int = STREAM_CHUNK_SIZE,
+                   restart: bool = False):
+    """Classify and draft ``chunk_size`` rows at a time, appending NDJSON and checkpointing each chunk.
+
+    A rerun resumes after the last checkpointed chunk; lines a crashed chunk
+    had already appended are truncated away first. Drafts of that chunk are
+    still in the draft cache, so redoing it costs no LLM calls.
+    """
+    model, cache = load_classifier()
+    os.makedirs(output_dir, exist_ok=True)
+    checkpoint = load_checkpoint(input_path, output_dir, restart=restart)
+    processed_path = os.path.join(output_dir, PROCESSED_NDJSON)
+    actionable_path = os.path.join(output_dir, ACTIONABLE_NDJSON)
+    _truncate(processed_path, checkpoint["processed_bytes"])
+    _truncate(actionable_path, checkpoint["actionable_bytes"])
+    if checkpoint["rows"]:
+        print(f"Resuming after {checkpoint['rows']} messages")
+
+    for chunk in iter_messages(input_path, chunk_size, skip=checkpoint["rows"]):
+        chunk = classify(chunk, model, cache=cache)
+        actionable = extract_actionable(chunk)
+        if len(actionable):
+            actionable = process_actionable_messages(actionable, model=model, cache=cache)
+
+        checkpoint["processed_bytes"] = append_ndjson(chunk, processed_path)
+        checkpoint["actionable_bytes"] = append_ndjson(actionable, actionable_path)
+        checkpoint["rows"] += len(chunk)
+        save_checkpoint(checkpoint, output_dir)
+        print(f"Processed {checkpoint['rows']} messages ({len(actionable)} actionable in this chunk)")
+
+    print(f"\nDone. Wrote {processed_path} and {actionable_path}")
+
+
 if __name__ == "__main__":
-    main("your_messages.csv")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Classify messages and draft responses to actionable ones.")
+    parser.add_argument("input", nargs="?", default="your_messages.csv")
+    parser.add_argument("--stream", action="store_true",
+                        help="Process in chunks, appending NDJSON and checkpointing so reruns resume")
+    parser.add_argument("--chunk-size", type=int, default=STREAM_CHUNK_SIZE)
+    parser.add_argument("--output-dir", default=".", help="Where --stream writes its NDJSON and checkpoint")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing --stream checkpoint")
+    args = parser.parse_args()
+
+    if args.stream:
+        main_streaming(args.input, args.output_dir, chunk_size=args.chunk_size, restart=args.restart)
+    else:
+        main(args.input)
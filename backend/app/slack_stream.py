@@ -0,0 +1,135 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable
+
+from config import SLACK_BATCH_SIZE, SLACK_BATCH_WAIT_SECONDS, SLACK_QUEUE_CAPACITY
+from metrics import registry
+
+STREAM_QUEUE_DEPTH = registry.gauge("slack_stream_queue_depth", "Slack messages waiting for a classification batch.")
+STREAM_BATCH_SIZE = registry.histogram(
+    "slack_stream_batch_size", "Messages per Slack classification batch.", buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+STREAM_REJECTED = registry.counter("slack_stream_rejected_total", "Slack messages refused because the queue was full.")
+
+
+def slack_to_row(message: dict, channel_name: str = "", workspace: str = "") -> dict:
+    """Map a normalized Slack message onto the classifier's message schema.
+
+    IDs are prefixed with the conversation, since Slack ``ts`` values are only
+    unique within a channel. The channel name stands in for a subject line.
+    """
+    conversation_id = message["conversation_id"]
+    parents = [ref["message_id"] for ref in message.get("ref_message_ids", []) if ref["ref_type"] == "parent"]
+    thread = parents[0] if parents else message["message_id"]
+    try:
+        timestamp = datetime.fromtimestamp(float(message["timestamp"]), tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    except (TypeError, ValueError):
+        timestamp = ""
+    channel = channel_name or conversation_id
+    return {
+        "message_id": f"slack:{conversation_id}:{message['message_id']}",
+        "source_system": "Slack",
+        "source_account": "",
+        "workspace_or_domain": workspace,
+        "channel_type": "slack_dm" if conversation_id.startswith("D") else "slack_channel",
+        "channel_name": channel,
+        "thread_id": f"slack:{conversation_id}:{thread}",
+        "timestamp_utc": timestamp,
+        "sender_name": message.get("user", ""),
+        "sender_handle_or_email": message.get("user", ""),
+        "recipient": channel,
+        "sent_to_external": False,
+        "subject_or_topic": channel,
+        "message_snippet": message.get("text", ""),
+        "category": "",
+        "order_id": "",
+        "priority": "",
+    }
+
+
+class MicroBatcher:
+    """Bounded queue that hands items to ``handle`` in batches on a background thread.
+
+    A batch is flushed once it holds ``max_size`` items or ``max_wait`` seconds
+    after its first item arrived, whichever comes first. ``put_many`` blocks
+    while the queue is full, so producers are slowed to the consumer's pace and
+    memory stays bounded by ``capacity``.
+    """
+
+    def __init__(self, handle: Callable[[list], None], max_size: int = SLACK_BATCH_SIZE,
+                 max_wait: float = SLACK_BATCH_WAIT_SECONDS, capacity: int = SLACK_QUEUE_CAPACITY):
+        self._handle = handle
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.capacity = capacity
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self.accepted = 0
+        self.batches = 0
+        self.failed_batches = 0
+
+        self._thread = threading.Thread(target=self._run, name="slack-batcher", daemon=True)
+        self._thread.start()
+
+    def put_many(self, items: list, timeout: float | None = None) -> bool:
+        """Queue all of ``items``, waiting up to ``timeout`` for room; False if there was none."""
+        if len(items) > self.capacity:
+            raise ValueError(f"Cannot queue {len(items)} items, capacity is {self.capacity}")
+        with self._cond:
+            has_room = self._cond.wait_for(
+                lambda: self._closed or len(self._items) + len(items) <= self.capacity, timeout,
+            )
+            if not has_room or self._closed:
+                STREAM_REJECTED.inc(len(items))
+                return False
+            self._items.extend(items)
+            self.accepted += len(items)
+            STREAM_QUEUE_DEPTH.set(len(self._items))
+            self._cond.notify_all()
+            return True
+
+    def _next_batch(self) -> list | None:
+        with self._cond:
+            self._cond.wait_for(lambda: self._items or self._closed)
+            if not self._items:
+                return None
+            deadline = time.monotonic() + self.max_wait
+            while len(self._items) < self.max_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = [self._items.popleft() for _ in range(min(self.max_size, len(self._items)))]
+            STREAM_QUEUE_DEPTH.set(len(self._items))
+            self._cond.notify_all()
+            return batch
+
+    def _run(self):
+        while (batch := self._next_batch()) is not None:
+            STREAM_BATCH_SIZE.observe(len(batch))
+            try:
+                self._handle(batch)
+            except Exception as error:
+                self.failed_batches += 1
+                print(f"Slack batch of {len(batch)} failed: {error}")
+            self.batches += 1
+
+    def progress(self) -> dict:
+        with self._cond:
+            return {
+                "queued": len(self._items),
+                "accepted": self.accepted,
+                "batches": self.batches,
+                "failed_batches": self.failed_batches,
+            }
+
+    def close(self):
+        """Stop accepting items, flush what is queued, and wait for the last batch."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
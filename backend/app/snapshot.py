@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+from typing import Callable
+
+import pyarrow as pa
+from config import SNAPSHOT_DIR, SNAPSHOT_KEEP, SNAPSHOT_POLL_SECONDS, SNAPSHOT_PUBLISH_SECONDS
+
+CURRENT_FILE = "CURRENT"
+SNAPSHOT_SUFFIX = ".arrow"
+
+
+def _snapshot_path(version: int, root: str) -> str:
+    return os.path.join(root, f"snapshot-{version}{SNAPSHOT_SUFFIX}")
+
+
+def _replace_file(path: str, data: bytes):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def publish_snapshot(columns: dict[str, list], root: str = SNAPSHOT_DIR) -> int:
+    """Write ``columns`` as a new snapshot, then point CURRENT at it.
+
+    Snapshots are uncompressed Arrow IPC files, so workers can map them
+    without decoding. Both steps are atomic renames, so readers see the old
+    version or the new one, never a partial file.
+    """
+    os.makedirs(root, exist_ok=True)
+    version = time.time_ns()
+    path = _snapshot_path(version, root)
+    table = pa.Table.from_pydict(columns)
+    with pa.OSFile(f"{path}.tmp", "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(f"{path}.tmp", path)
+    _replace_file(os.path.join(root, CURRENT_FILE), str(version).encode())
+
+    versions = sorted(
+        int(name[len("snapshot-"):-len(SNAPSHOT_SUFFIX)])
+        for name in os.listdir(root)
+        if name.startswith("snapshot-") and name.endswith(SNAPSHOT_SUFFIX)
+    )
+    for old in versions[:-SNAPSHOT_KEEP]:
+        os.remove(_snapshot_path(old, root))
+    return version
+
+
+def current_version(root: str = SNAPSHOT_DIR) -> int | None:
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def read_snapshot(version: int, root: str = SNAPSHOT_DIR) -> pa.Table:
+    """Open a snapshot through a read-only memory map.
+
+    Column buffers point into the mapped file rather than into memory the
+    worker allocates, so every worker shares the page cache's single copy.
+    """
+    return pa.ipc.open_file(pa.memory_map(_snapshot_path(version, root))).read_all()
+
+
+class SnapshotPublisher:
+    """Builder side: republish the store whenever it has changed since the last snapshot."""
+
+    def __init__(self, get_store: Callable, interval: float = SNAPSHOT_PUBLISH_SECONDS):
+        self._get_store = get_store
+        self._interval = interval
+        self._published = None
+        self._stop = threading.Event()
+        self.version = None
+        self._thread = threading.Thread(target=self._run, name="snapshot-publisher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def publish(self):
+        store = self._get_store()
+        if store is None or store.version == self._published:
+            return
+        # Read the change counter first so edits made while writing trigger another publish.
+        changes = store.version
+        self.version = publish_snapshot(store.serialized())
+        self._published = changes
+        print(f"Published snapshot {self.version} ({len(store)} messages)")
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            self.publish()
+
+    def stop(self):
+        self._stop.set()
+        self.publish()
+
+
+class SnapshotWatcher:
+    """Worker side: load each new snapshot version as it appears."""
+
+    def __init__(self, on_load: Callable[[int, pa.Table], None], interval: float = SNAPSHOT_POLL_SECONDS):
+        self._on_load = on_load
+        self._interval = interval
+        self._stop = threading.Event()
+        self.version = None
+        self._thread = threading.Thread(target=self._run, name="snapshot-watcher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def poll(self):
+        version = current_version()
+        if version is None or version == self.version:
+            return
+        try:
+            table = read_snapshot(version)
+        except OSError:
+            # Pruned between reading CURRENT and opening it; the next poll sees a newer version.
+            return
+        if "row_json" not in table.column_names:
+            # Written before snapshots carried serialized rows; wait for the builder's next publish.
+            return
+        self._on_load(version, table)
+        self.version = version
+
+    def _run(self):
+        while True:
+            self.poll()
+            if self._stop.wait(self._interval):
+                return
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,51 @@
+"""Compare two benchmark result files and flag regressions.
+
+    python compare.py baseline.jsonl candidate.jsonl --threshold 0.1
+
+Rates (``value``) regress when they drop, latencies (``p50_ms``/``p99_ms``)
+when they rise, by more than ``threshold``. Exits non-zero on any regression.
+"""
+
+import argparse
+import json
+import sys
+
+HIGHER_IS_BETTER = ["value"]
+LOWER_IS_BETTER = ["p50_ms", "p99_ms"]
+
+
+def load(path: str) -> dict:
+    """Latest result per (suite, scale, metric)."""
+    results = {}
+    with open(path) as f:
+        for line in f:
+            row = json.loads(line)
+            results[(row["suite"], row["scale"], row["metric"])] = row
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    regressions = 0
+
+    for key in sorted(baseline.keys() & candidate.keys(), key=str):
+        before, after = baseline[key], candidate[key]
+        for field in HIGHER_IS_BETTER + LOWER_IS_BETTER:
+            if field not in before or field not in after or not before[field]:
+                continue
+            change = (after[field] - before[field]) / before[field]
+            worse = change < -args.threshold if field in HIGHER_IS_BETTER else change > args.threshold
+            regressions += worse
+            print(json.dumps({
+                "suite": key[0], "scale": key[1], "metric": key[2], "field": field,
+                "baseline": before[field], "candidate": after[field],
+                "change": round(change, 4), "regression": worse,
+            }))
+
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,131 @@
+"""Local stand-in for Ollama's ``/api/chat`` endpoint.
+
+Replies after a configurable delay with a canned completion and the same
+response fields Ollama returns, so the LLM client can be load-tested without
+a GPU or a real model. Streaming requests get NDJSON chunks, with a fifth of
+the latency spent before the first one. ``format: json`` requests listing
+``message_id:`` lines get a JSON object with a reply per message.
+
+    python fake_ollama.py --port 11434 --latency 1.5
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_stream(self, model: str, content: str, delay: float):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        words = content.split(" ")
+        time.sleep(delay * 0.2)
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(delay * 0.8 / len(words))
+            self._write_chunk({"model": model, "message": {"role": "assistant", "content": word + " "}, "done": False})
+        self._write_chunk({"model": model, "message": {"role": "assistant", "content": ""}, "done": True,
+                           "eval_count": len(content) // 4, "total_duration": int(delay * 1e9)})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, body: dict):
+        line = json.dumps(body).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if self.path != "/api/chat":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.peak_in_flight = max(server.peak_in_flight, server.in_flight)
+        try:
+            delay = max(0.0, random.gauss(server.latency, server.jitter))
+
+            if random.random() < server.error_rate:
+                self._send_json(503, {"error": "model is loading"})
+                return
+
+            prompt = request.get("messages", [{}])[-1].get("content", "")
+            content = f"Thanks for reaching out! (fake reply to {len(prompt)} prompt chars)"
+            if request.get("format") == "json":
+                ids = re.findall(r"^message_id: (\S+)$", prompt, re.MULTILINE)
+                content = json.dumps({message_id: f"Thanks for reaching out about {message_id}!" for message_id in ids})
+            if request.get("stream"):
+                self._send_stream(request.get("model", "fake"), content, delay)
+                return
+
+            time.sleep(delay)
+            self._send_json(200, {
+                "model": request.get("model", "fake"),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "message": {"role": "assistant", "content": content},
+                "done": True,
+                "total_duration": int(delay * 1e9),
+                "prompt_eval_count": len(prompt) // 4,
+                "eval_count": len(content) // 4,
+                "eval_duration": int(delay * 1e9),
+            })
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+def start_server(port: int = 0, latency: float = 0.5, jitter: float = 0.0,
+                 error_rate: float = 0.0) -> ThreadingHTTPServer:
+    """Start the fake server on a background thread; ``port=0`` picks a free port."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeOllamaHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.jitter = jitter
+    server.error_rate = error_rate
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.in_flight = 0
+    server.peak_in_flight = 0
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/api/chat"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.5, help="Mean seconds per completion")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Std-dev of the latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    args = parser.parse_args()
+
+    server = start_server(args.port, args.latency, args.jitter, args.error_rate)
+    print(f"Fake Ollama listening on {server.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
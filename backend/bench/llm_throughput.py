@@ -0,0 +1,47 @@
+"""Compare serial and concurrent draft generation against the fake Ollama server.
+
+    python llm_throughput.py --messages 40 --latency 0.5 --concurrency 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from fake_ollama import start_server
+from llm_client import OllamaClient
+
+
+def run(client: OllamaClient, prompts: list[str]) -> dict:
+    start = time.perf_counter()
+    responses = client.chat_many(prompts)
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": client.concurrency,
+        "messages": len(prompts),
+        "seconds": round(elapsed, 3),
+        "messages_per_sec": round(len(prompts) / elapsed, 2),
+        "errors": sum(r.startswith("ERROR:") for r in responses),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    server = start_server(latency=args.latency, error_rate=args.error_rate)
+    prompts = [f"Draft a reply to message {i}" for i in range(args.messages)]
+
+    for concurrency in (1, args.concurrency):
+        client = OllamaClient(url=server.url, concurrency=concurrency, backoff=0.05)
+        print(json.dumps(run(client, prompts)))
+        client.close()
+
+    server.shutdown()
@@ -0,0 +1,159 @@
+"""Benchmark harness for classification, draft generation, API reads and Slack normalization.
+
+Each measurement is appended to the output as one JSON line tagged with the
+git commit, so results from different commits can be diffed with compare.py.
+
+    python run.py --scales 1000 10000 100000 --output results.jsonl
+    python run.py --suites endpoints normalize --scales 1000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'supabase', 'python'))
+
+from synth import classified_inbox, synthetic_inbox, synthetic_slack_history
+
+SUITES = ["classify", "drafts", "endpoints", "normalize"]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def percentiles(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "p50_ms": round(pick(0.50) * 1000, 3),
+        "p90_ms": round(pick(0.90) * 1000, 3),
+        "p99_ms": round(pick(0.99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+
+def bench_classify(scale: int, args) -> list[dict]:
+    from classifier import get_device, load_model, predict_texts
+
+    model = load_model(get_device())
+    df = synthetic_inbox(scale)
+    texts = (df["subject_or_topic"] + ": " + df["message_snippet"]).tolist()
+
+    start = time.perf_counter()
+    predict_texts(texts, model)
+    elapsed = time.perf_counter() - start
+    return [{"metric": "classify_rows_per_sec", "value": round(scale / elapsed, 2), "seconds": round(elapsed, 3)}]
+
+
+def bench_drafts(scale: int, args) -> list[dict]:
+    from fake_ollama import start_server
+    from llm_client import OllamaClient
+
+    count = min(scale, args.draft_cap)
+    server = start_server(latency=args.llm_latency, jitter=args.llm_latency / 10)
+    client = OllamaClient(url=server.url, concurrency=args.llm_concurrency)
+    try:
+        prompts = [f"Draft a reply to message {i}" for i in range(count)]
+        start = time.perf_counter()
+        client.chat_many(prompts)
+        elapsed = time.perf_counter() - start
+    finally:
+        client.close()
+        server.shutdown()
+    return [{
+        "metric": "drafts_per_sec",
+        "value": round(count / elapsed, 2),
+        "messages": count,
+        "llm_latency_s": args.llm_latency,
+        "concurrency": args.llm_concurrency,
+        "peak_in_flight": server.peak_in_flight,
+    }]
+
+
+def bench_endpoints(scale: int, args) -> list[dict]:
+    from fastapi.testclient import TestClient
+
+    import api
+    from message_store import MessageStore
+
+    api.store = MessageStore.from_dataframe(classified_inbox(scale))
+    api.startup_phase = "ready"
+    client = TestClient(api.app)  # Not entered as a context manager, so lifespan never loads the model.
+
+    results = []
+    for path in ["/messages", "/messages/requires_response", "/messages/notification"]:
+        samples = []
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            response = client.get(path)
+            samples.append(time.perf_counter() - start)
+            response.raise_for_status()
+        results.append({"metric": f"GET {path}", "bytes": len(response.content), **percentiles(samples)})
+    return results
+
+
+def bench_normalize(scale: int, args) -> list[dict]:
+    from slack_channels.normalize import ThreadIndex, build_thread_tree, normalize_messages
+
+    history = synthetic_slack_history(scale)
+
+    start = time.perf_counter()
+    normalized = normalize_messages(history, "CBENCH")
+    normalize_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = ThreadIndex()
+    normalize_messages(history, "CBENCH", index)
+    build_thread_tree(normalized, index)
+    threads_seconds = time.perf_counter() - start
+
+    return [
+        {"metric": "normalize_messages_per_sec", "value": round(scale / normalize_seconds, 1)},
+        {"metric": "normalize_with_threads_per_sec", "value": round(scale / threads_seconds, 1)},
+    ]
+
+
+BENCHES = {
+    "classify": bench_classify,
+    "drafts": bench_drafts,
+    "endpoints": bench_endpoints,
+    "normalize": bench_normalize,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=SUITES)
+    parser.add_argument("--scales", nargs="+", type=int, default=[1000, 10000, 100000])
+    parser.add_argument("--output", default="bench_results.jsonl")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per endpoint")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Fake Ollama seconds per completion")
+    parser.add_argument("--llm-concurrency", type=int, default=8)
+    parser.add_argument("--draft-cap", type=int, default=200, help="Max drafts generated per scale")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    with open(args.output, "a") as out:
+        for suite in args.suites:
+            for scale in args.scales:
+                base = {"suite": suite, "scale": scale, "commit": commit, "timestamp": time.time()}
+                try:
+                    rows = BENCHES[suite](scale, args)
+                except ImportError as error:
+                    rows = [{"metric": "skipped", "reason": f"missing dependency: {error.name}"}]
+                except OSError as error:
+                    rows = [{"metric": "skipped", "reason": str(error)}]
+                for row in rows:
+                    line = json.dumps({**base, **row})
+                    print(line)
+                    out.write(line + "\n")
@@ -0,0 +1,66 @@
+"""Synthetic inboxes in the your_messages.csv schema and Slack history payloads.
+
+Rows are drawn from the real CSV as templates, with fresh IDs, timestamps,
+senders and order numbers, so text lengths and label mix match production
+data at any scale.
+"""
+
+import os
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'supabase', 'python', 'bench'))
+
+from config import DATA_DIR
+from fake_slack import make_history
+
+FIRST_NAMES = ["Jenna", "Marcus", "Aisha", "Wei", "Priya", "Tom", "Siti", "Daniel", "Mei", "Arjun"]
+LAST_NAMES = ["Lee", "Tan", "Khan", "Lim", "Nair", "Wong", "Ong", "Singh", "Chua", "Goh"]
+ACTION_BUCKETS = ["requires_response", "requires_decision", "requires_review", "financial_action",
+                  "alert", "notification", "personal"]
+
+
+def synthetic_inbox(n: int, seed: int = 0) -> pd.DataFrame:
+    templates = pd.read_csv(os.path.join(DATA_DIR, "your_messages.csv")).to_dict(orient="records")
+    rng = random.Random(seed)
+    start = datetime(2025, 2, 1, tzinfo=timezone.utc)
+    rows = []
+
+    for i in range(n):
+        row = dict(rng.choice(templates))
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        order = rng.randrange(10000, 99999)
+        row.update({
+            "message_id": f"SYN{i:07d}",
+            "thread_id": f"THR-S{i // 3:07d}",
+            "timestamp_utc": (start + timedelta(seconds=i * 37)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "sender_name": f"{first} {last}",
+            "sender_handle_or_email": f"{first}.{last}@example.com".lower(),
+            "subject_or_topic": f"{row['subject_or_topic']} #{order}",
+            "order_id": f"ORD-2025-{order}" if isinstance(row.get("order_id"), str) else row.get("order_id"),
+        })
+        rows.append(row)
+
+    return pd.DataFrame(rows)
+
+
+def classified_inbox(n: int, seed: int = 0) -> pd.DataFrame:
+    """Synthetic inbox with random labels and drafts filled in, for serving benchmarks."""
+    df = synthetic_inbox(n, seed)
+    rng = random.Random(seed + 1)
+    df["action_bucket"] = [rng.choice(ACTION_BUCKETS) for _ in range(n)]
+    df["classification_confidence"] = [round(rng.uniform(0.3, 0.99), 4) for _ in range(n)]
+    df["draft_response"] = [
+        "Thanks for reaching out, we are looking into it." if bucket in ACTION_BUCKETS[:2] else ""
+        for bucket in df["action_bucket"]
+    ]
+    return df
+
+
+def synthetic_slack_history(n: int, channel_id: str = "CBENCH", thread_ratio: float = 0.2) -> list[dict]:
+    """conversations.history messages, newest first, with about ``thread_ratio`` replies."""
+    return make_history(channel_id, n, thread_ratio=thread_ratio)
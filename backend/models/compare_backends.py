@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from config import DATA_DIR, LABEL2ID
+from examples import FEW_SHOT_EXAMPLES
+
+
+def measure(backend: str, repeats: int) -> dict:
+    """Load one backend in this process and report accuracy, latency and peak RSS."""
+    import numpy as np
+    import pandas as pd
+    from classifier import encode_texts, head_proba, load_model
+
+    start = time.perf_counter()
+    model = load_model("cpu", backend=backend)
+    load_seconds = time.perf_counter() - start
+
+    df = pd.read_csv(os.path.join(DATA_DIR, "your_messages.csv"))
+    csv_texts = (df["subject_or_topic"] + ": " + df["message_snippet"]).tolist()
+    example_texts = [example["text"] for example in FEW_SHOT_EXAMPLES]
+    example_labels = [LABEL2ID[example["label"]] for example in FEW_SHOT_EXAMPLES]
+
+    example_probs = head_proba(model, encode_texts(example_texts, model))
+    encode_texts(csv_texts[:8], model)  # warm-up
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        csv_probs = head_proba(model, encode_texts(csv_texts, model))
+        timings.append(time.perf_counter() - start)
+
+    return {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 3),
+        "examples_accuracy": float(np.mean(example_probs.argmax(axis=1) == np.array(example_labels))),
+        "csv_rows": len(csv_texts),
+        "csv_seconds_best": round(min(timings), 4),
+        "rows_per_sec": round(len(csv_texts) / min(timings), 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "csv_probabilities": csv_probs.tolist(),
+    }
+
+
+def compare(backends: list[str], repeats: int) -> list[dict]:
+    """Measure each backend in its own process so peak RSS is not shared."""
+    import numpy as np
+
+    results = []
+    for backend in backends:
+        output = subprocess.run(
+            [sys.executable, __file__, "--worker", backend, "--repeats", str(repeats)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    reference = np.array(results[0]["csv_probabilities"])
+    for result in results:
+        probs = np.array(result.pop("csv_probabilities"))
+        result["csv_agreement_vs_" + results[0]["backend"]] = float(
+            np.mean(probs.argmax(axis=1) == reference.argmax(axis=1))
+        )
+        result["max_prob_diff"] = round(float(np.abs(probs - reference).max()), 5)
+        result["speedup"] = round(results[0]["csv_seconds_best"] / result["csv_seconds_best"], 2)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare fp32 PyTorch against the ONNX backends.")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure(args.worker, args.repeats)))
+    else:
+        for result in compare(args.backends, args.repeats):
+            print(json.dumps(result))
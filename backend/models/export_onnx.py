@@ -0,0 +1,65 @@
+import inspect
+import json
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+import torch
+from onnxruntime.quantization import QuantType, quantize_dynamic
+from setfit import SetFitModel
+from config import MODEL_PATH, ONNX_DIR
+from onnx_backend import FP32_FILE, INT8_FILE, POOLING_FILE
+
+
+def export():
+    """Export the trained SetFit body to ONNX, plus a dynamically quantized int8 copy.
+
+    Run after train.py. The logistic head stays in MODEL_PATH and is shared by
+    every backend.
+    """
+    model = SetFitModel.from_pretrained(MODEL_PATH)
+    body = model.model_body
+    transformer = body[0].auto_model.eval()
+    tokenizer = body.tokenizer
+    os.makedirs(ONNX_DIR, exist_ok=True)
+
+    # Graph inputs follow forward()'s parameter order (input_ids, attention_mask,
+    # token_type_ids for BERT), not the tokenizer's, so name them in that order
+    # and pass the sample by keyword.
+    parameters = list(inspect.signature(transformer.forward).parameters)
+    input_names = sorted(tokenizer.model_input_names, key=parameters.index)
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    fp32_path = os.path.join(ONNX_DIR, FP32_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            ({name: sample[name] for name in input_names},),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+        )
+    quantize_dynamic(fp32_path, os.path.join(ONNX_DIR, INT8_FILE), weight_type=QuantType.QInt8)
+
+    # The sentence-transformers pooling and normalization are reimplemented in NumPy.
+    pooling = body[1]
+    with open(os.path.join(ONNX_DIR, POOLING_FILE), "w") as f:
+        json.dump({
+            "mode": pooling.get_pooling_mode_str(),
+            "normalize": any(type(module).__name__ == "Normalize" for module in body),
+            "max_seq_length": body.max_seq_length,
+            "dimension": body.get_sentence_embedding_dimension(),
+        }, f, indent=2)
+    tokenizer.save_pretrained(ONNX_DIR)
+
+    print(f"ONNX models saved to {ONNX_DIR}")
+
+
+if __name__ == "__main__":
+    export()
@@ -0,0 +1,74 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+import joblib
+import numpy as np
+from safetensors.numpy import save_file
+from transformers import AutoTokenizer
+from config import MODEL_PATH, ONNX_DIR
+from onnx_backend import FP32_FILE, INT8_FILE, POOLING_FILE
+from packed_model import FORMAT_VERSION, packed_path
+
+
+def head_params(head) -> dict:
+    """Constructor arguments of the head that survive a JSON round trip."""
+    return {key: value for key, value in head.get_params().items()
+            if value is None or isinstance(value, (bool, int, float, str))}
+
+
+def is_multinomial(head) -> bool:
+    # scikit-learn fits multinomial unless asked for one-vs-rest or using liblinear.
+    return getattr(head, "multi_class", "auto") != "ovr" and head.solver != "liblinear"
+
+
+def pack(quantized: bool = False):
+    """Pack the exported ONNX body, tokenizer, pooling and fitted head into one safetensors file.
+
+    Run after export_onnx.py. ``classifier.load_model`` reads the result with
+    the ``packed`` / ``packed-int8`` backends.
+    """
+    with open(os.path.join(ONNX_DIR, INT8_FILE if quantized else FP32_FILE), "rb") as f:
+        graph = f.read()
+    with open(os.path.join(ONNX_DIR, POOLING_FILE)) as f:
+        pooling = json.load(f)
+    tokenizer = AutoTokenizer.from_pretrained(ONNX_DIR)
+    pooling.update(pad_token=tokenizer.pad_token, pad_id=tokenizer.pad_token_id)
+    tokenizer_json = tokenizer.backend_tokenizer.to_str()
+    head = joblib.load(os.path.join(MODEL_PATH, "model_head.pkl"))
+
+    # Identifies the body for the embedding cache without rehashing the file at startup.
+    body_digest = hashlib.sha256(graph)
+    body_digest.update(tokenizer_json.encode("utf-8"))
+    body_digest.update(json.dumps(pooling, sort_keys=True).encode("utf-8"))
+
+    path = packed_path(MODEL_PATH, quantized)
+    save_file(
+        {
+            "body.onnx": np.frombuffer(graph, dtype=np.uint8),
+            "head.coef": np.asarray(head.coef_, dtype=np.float64),
+            "head.intercept": np.asarray(head.intercept_, dtype=np.float64),
+            "head.classes": np.asarray(head.classes_),
+        },
+        path,
+        metadata={
+            "format": FORMAT_VERSION,
+            "body_sha256": body_digest.hexdigest(),
+            "pooling": json.dumps(pooling),
+            "tokenizer": tokenizer_json,
+            "head_multi_class": "multinomial" if is_multinomial(head) else "ovr",
+            "head_params": json.dumps(head_params(head)),
+        },
+    )
+    print(f"Packed model saved to {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write the single-file model artifact for fast startup.")
+    parser.add_argument("--quantized", action="store_true", help="Pack the int8 ONNX body instead of fp32")
+    pack(parser.parse_args().quantized)
@@ -0,0 +1,148 @@
+"""Local stand-in for the Slack Web API methods the service calls.
+
+Serves ``conversations.list`` and ``conversations.history`` from generated
+data with real cursor pagination and ``oldest``/``latest`` filtering. It can
+also answer a share of requests with 429 and ``Retry-After``. Point the
+service at it with ``SLACK_API_URL=http://127.0.0.1:<port>/api/``.
+
+    python fake_slack.py --port 3001 --channels 30 --messages 5000
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def make_history(channel_id: str, count: int, start_ts: float = 1_700_000_000.0,
+                 thread_ratio: float = 0.2) -> list[dict]:
+    """Messages newest first, as conversations.history returns them.
+
+    About ``thread_ratio`` of the messages are replies to an earlier message.
+    """
+    rng = random.Random(channel_id)
+    messages = []
+    for i in range(count):
+        ts = f"{start_ts + i:.6f}"
+        message = {"type": "message", "ts": ts, "user": f"U{rng.randrange(50):04d}",
+                   "text": f"Message {i} in {channel_id}"}
+        if messages and rng.random() < thread_ratio:
+            # Slack threads are one level deep: replies point at the thread root.
+            parent = messages[rng.randrange(len(messages))]
+            message["thread_ts"] = parent.get("thread_ts", parent["ts"])
+        messages.append(message)
+    return messages[::-1]
+
+
+class FakeSlackHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict, headers: dict | None = None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _params(self) -> dict:
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length", 0) or 0)
+        if length:
+            body = self.rfile.read(length).decode("utf-8")
+            params.update({key: values[-1] for key, values in parse_qs(body).items()})
+        return params
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def _handle(self):
+        server = self.server
+        method = urlparse(self.path).path.rsplit("/", 1)[-1]
+        params = self._params()
+
+        with server.lock:
+            server.calls[method] = server.calls.get(method, 0) + 1
+            limited = random.random() < server.rate_limit_ratio
+            if limited:
+                server.rate_limited += 1
+        if limited:
+            self._send_json(429, {"ok": False, "error": "ratelimited"}, {"Retry-After": str(server.retry_after)})
+            return
+
+        time.sleep(server.latency)
+        if method == "conversations.list":
+            self._page(params, server.conversations, "channels")
+        elif method == "conversations.history":
+            history = server.histories.get(params.get("channel", ""))
+            if history is None:
+                self._send_json(200, {"ok": False, "error": "channel_not_found"})
+                return
+            oldest = float(params.get("oldest") or 0)
+            latest = float(params.get("latest") or "inf")
+            # The service only pages forward, so filtering per request is fine for a stub.
+            window = [m for m in history if oldest < float(m["ts"]) < latest]
+            self._page(params, window, "messages")
+        else:
+            self._send_json(200, {"ok": False, "error": "unknown_method"})
+
+    def _page(self, params: dict, items: list, key: str):
+        start = int(params.get("cursor") or 0)
+        limit = int(params.get("limit") or 100)
+        page = items[start:start + limit]
+        next_cursor = str(start + limit) if start + limit < len(items) else ""
+        self._send_json(200, {
+            "ok": True,
+            key: page,
+            "has_more": bool(next_cursor),
+            "response_metadata": {"next_cursor": next_cursor},
+        })
+
+
+def start_server(port: int = 0, channels: int = 5, messages: int = 500, latency: float = 0.0,
+                 rate_limit_ratio: float = 0.0, retry_after: int = 1) -> ThreadingHTTPServer:
+    """Start the fake API on a background thread; ``port=0`` picks a free port."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeSlackHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.rate_limit_ratio = rate_limit_ratio
+    server.retry_after = retry_after
+    server.lock = threading.Lock()
+    server.calls = {}
+    server.rate_limited = 0
+    server.conversations = [{"id": f"C{i:05d}", "name": f"channel-{i}", "is_channel": True} for i in range(channels)]
+    server.histories = {c["id"]: make_history(c["id"], messages) for c in server.conversations}
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/api/"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=3001)
+    parser.add_argument("--channels", type=int, default=5)
+    parser.add_argument("--messages", type=int, default=500, help="Messages per channel")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per API call")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="Fraction of calls answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+
+    server = start_server(args.port, args.channels, args.messages, args.latency,
+                          args.rate_limit_ratio, args.retry_after)
+    print(f"Fake Slack API listening on {server.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -2,20 +2,52 @@ from __future__ import annotations
 
 """FastAPI application that mirrors the original Slack Edge Function."""
 
+import json
 import os
-from typing import Any
+import time
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Iterator, Literal
 
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from slack_sdk.errors import SlackApiError
 
+from .cache import SlackCache
 from .constants import CORS_CONFIG
-from .normalize import normalize_messages
-from .slack_client import DEFAULT_MESSAGE_LIMIT, get_conversations, get_messages
+from .forward import start_forwarder
+from .metrics import CONTENT_TYPE, registry
+from .normalize import ThreadIndex, build_thread_tree, normalize_messages
+from .slack_client import DEFAULT_CONVERSATION_LIMIT, DEFAULT_MESSAGE_LIMIT, method_concurrency
 
-app = FastAPI(title="Slack Conversations Service", version="0.1.0")
+MAX_BATCH_CHANNELS = 100
+
+_cache: SlackCache | None = None
+
+
+def _get_cache() -> SlackCache:
+    global _cache
+    if _cache is None:
+        _cache = SlackCache()
+    return _cache
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    forwarder = start_forwarder(_get_cache)
+    yield
+    if forwarder is not None:
+        forwarder.stop()
+
+
+app = FastAPI(title="Slack Conversations Service", version="0.1.0", lifespan=lifespan)
 app.add_middleware(CORSMiddleware, **CORS_CONFIG)
 
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_seconds", "Latency until response headers, by route.", ("method", "route", "status"),
+)
+
 
 def _require_token() -> str:
     token = os.getenv("SLACK_USER_TOKEN")
@@ -24,7 +56,7 @@ def _require_token() -> str:
     return token
 
 
-def _raise_slack_error(error: SlackApiError) -> None:
+def _slack_error_detail(error: SlackApiError) -> tuple[int, dict[str, Any]]:
     response = getattr(error, "response", None)
     status_code = getattr(response, "status_code", None) or 502
     detail: dict[str, Any] = {"error": "Slack API request failed"}
@@ -34,9 +66,42 @@ def _raise_slack_error(error: SlackApiError) -> None:
         if slack_error:
             detail["slack_error"] = slack_error
 
+    return status_code, detail
+
+
+def _raise_slack_error(error: SlackApiError) -> None:
+    status_code, detail = _slack_error_detail(error)
     raise HTTPException(status_code=status_code, detail=detail)
 
 
+def _channel_payload(token: str, channel_id: str, limit: int, view: str) -> dict[str, Any]:
+    messages = _get_cache().get_messages(token, channel_id, limit=limit)
+    thread_index = ThreadIndex()
+    normalized = normalize_messages(messages, channel_id, thread_index)
+    if view == "threads":
+        threads = build_thread_tree(normalized, thread_index)
+        return {"threads": threads, "count": len(normalized), "thread_count": len(threads)}
+    return {"messages": normalized, "count": len(normalized)}
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - start, method=request.method, route=route, status=response.status_code,
+    )
+    return response
+
+
+@app.get("/metrics")
+def metrics_handler() -> Response:
+    """Per-stage counters and latencies in Prometheus text format."""
+
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
+
 @app.get("/slack/conversations")
 def conversations_handler(
     channel_id: str | None = Query(
@@ -49,6 +114,10 @@ def conversations_handler(
         le=1000,
         description="Max messages to fetch when channel_id is supplied.",
     ),
+    view: Literal["flat", "threads"] = Query(
+        default="flat",
+        description="'threads' nests replies under their parent messages.",
+    ),
 ):
     """Return either the workspace's conversations list or a channel's normalized messages."""
 
@@ -56,16 +125,57 @@ def conversations_handler(
 
     if channel_id:
         try:
-            messages = get_messages(token, channel_id, limit=limit)
+            return _channel_payload(token, channel_id, limit, view)
         except SlackApiError as error:
             _raise_slack_error(error)
 
-        normalized = normalize_messages(messages, channel_id)
-        return {"messages": normalized, "count": len(normalized)}
-
     try:
-        conversations = get_conversations(token)
+        conversations = _get_cache().get_conversations(token, limit=DEFAULT_CONVERSATION_LIMIT)
     except SlackApiError as error:
         _raise_slack_error(error)
 
     return {"conversations": conversations, "count": len(conversations)}
+
+
+@app.get("/slack/conversations/batch")
+def conversations_batch_handler(
+    channel_ids: list[str] = Query(
+        description="Channels to fetch; repeat the parameter or pass a comma-separated list.",
+    ),
+    limit: int = Query(default=DEFAULT_MESSAGE_LIMIT, ge=1, le=1000),
+    view: Literal["flat", "threads"] = Query(default="flat"),
+):
+    """Fetch many channels concurrently, streaming one NDJSON line per channel as it finishes.
+
+    Failed channels produce a line with ``error`` instead of messages, and a
+    final ``done`` line summarizes the batch.
+    """
+
+    token = _require_token()
+    ids = list(dict.fromkeys(cid.strip() for value in channel_ids for cid in value.split(",") if cid.strip()))
+    if len(ids) > MAX_BATCH_CHANNELS:
+        raise HTTPException(status_code=400, detail={"error": f"At most {MAX_BATCH_CHANNELS} channels per batch"})
+
+    def lines() -> Iterator[str]:
+        executor = ThreadPoolExecutor(max_workers=method_concurrency("conversations.history"))
+        failed = 0
+        try:
+            futures = {executor.submit(_channel_payload, token, cid, limit, view): cid for cid in ids}
+            for future in as_completed(futures):
+                channel_id = futures[future]
+                try:
+                    result = {"channel_id": channel_id, **future.result()}
+                except SlackApiError as error:
+                    status_code, detail = _slack_error_detail(error)
+                    result = {"channel_id": channel_id, "status_code": status_code, **detail}
+                    failed += 1
+                except Exception as error:  # Report per channel instead of aborting the stream.
+                    result = {"channel_id": channel_id, "status_code": 500, "error": str(error)}
+                    failed += 1
+                yield json.dumps(result) + "\n"
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        yield json.dumps({"done": True, "channels": len(ids), "failed": failed}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+"""SQLite cache of channel history and the conversation list.
+
+Each channel keeps a watermark: the newest ``ts`` fetched so far. A repeat
+view asks ``conversations.history`` only for messages newer than that,
+merges them in and answers from the cache. The delta is capped at the
+request's ``limit``; when it fills up, the older cached rows are dropped so
+the cached range never has a hole. Older history is fetched only
+when a request needs more messages than are cached. Edits and deletions of
+messages already cached are not picked up.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from itertools import islice
+from typing import Any
+
+from .slack_client import PAGE_SIZE, iter_conversations, iter_messages
+
+SLACK_CACHE_PATH = os.getenv("SLACK_CACHE_PATH", "slack_cache.sqlite3")
+# A channel synced this recently is served without asking Slack for new messages.
+HISTORY_MIN_SYNC_SECONDS = float(os.getenv("SLACK_HISTORY_MIN_SYNC_SECONDS", "5"))
+CONVERSATIONS_TTL_SECONDS = float(os.getenv("SLACK_CONVERSATIONS_TTL_SECONDS", "300"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    token_key TEXT NOT NULL,
+    channel_id TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (token_key, channel_id, ts)
+);
+CREATE TABLE IF NOT EXISTS channels (
+    token_key TEXT NOT NULL,
+    channel_id TEXT NOT NULL,
+    newest_ts TEXT,
+    oldest_ts TEXT,
+    complete INTEGER NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (token_key, channel_id)
+);
+CREATE TABLE IF NOT EXISTS conversations (
+    token_key TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    complete INTEGER NOT NULL,
+    fetched_at REAL NOT NULL
+);
+"""
+
+
+def _token_key(token: str) -> str:
+    # Entries are scoped per token so one user's cache never serves another's channels.
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class SlackCache:
+    def __init__(self, path: str = SLACK_CACHE_PATH):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._db_lock = threading.Lock()
+        self._channel_locks: dict[tuple[str, str], threading.Lock] = {}
+
+    def _channel_lock(self, key: tuple[str, str]) -> threading.Lock:
+        with self._db_lock:
+            return self._channel_locks.setdefault(key, threading.Lock())
+
+    def _state(self, token_key: str, channel_id: str) -> tuple | None:
+        with self._db_lock:
+            return self._conn.execute(
+                "SELECT newest_ts, oldest_ts, complete, synced_at FROM channels"
+                " WHERE token_key = ? AND channel_id = ?",
+                (token_key, channel_id),
+            ).fetchone()
+
+    def _merge(
+        self, token_key: str, channel_id: str, messages: list[dict[str, Any]], complete: bool, replace: bool = False,
+    ):
+        with self._db_lock:
+            self._conn.execute("BEGIN")
+            if replace:
+                self._conn.execute(
+                    "DELETE FROM messages WHERE token_key = ? AND channel_id = ?", (token_key, channel_id)
+                )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO messages (token_key, channel_id, ts, payload) VALUES (?, ?, ?, ?)",
+                [(token_key, channel_id, m["ts"], json.dumps(m)) for m in messages if m.get("ts")],
+            )
+            newest, oldest = self._conn.execute(
+                "SELECT MAX(ts), MIN(ts) FROM messages WHERE token_key = ? AND channel_id = ?",
+                (token_key, channel_id),
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO channels (token_key, channel_id, newest_ts, oldest_ts, complete, synced_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (token_key, channel_id, newest, oldest, int(complete), time.time()),
+            )
+            self._conn.execute("COMMIT")
+
+    def _latest(self, token_key: str, channel_id: str, limit: int) -> list[dict[str, Any]]:
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT payload FROM messages WHERE token_key = ? AND channel_id = ?"
+                " ORDER BY ts DESC LIMIT ?",
+                (token_key, channel_id, limit),
+            ).fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    def _count(self, token_key: str, channel_id: str) -> int:
+        with self._db_lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE token_key = ? AND channel_id = ?",
+                (token_key, channel_id),
+            ).fetchone()[0]
+
+    def get_messages(self, token: str, channel_id: str, *, limit: int) -> list[dict[str, Any]]:
+        """Return the ``limit`` newest messages, newest first, after merging the delta from Slack."""
+
+        token_key = _token_key(token)
+        with self._channel_lock((token_key, channel_id)):
+            state = self._state(token_key, channel_id)
+
+            if state is None:
+                fetched = list(islice(iter_messages(token, channel_id, page_size=min(limit, PAGE_SIZE)), limit))
+                self._merge(token_key, channel_id, fetched, complete=len(fetched) < limit)
+                return self._latest(token_key, channel_id, limit)
+
+            newest_ts, oldest_ts, complete, synced_at = state
+            if time.time() - synced_at >= HISTORY_MIN_SYNC_SECONDS:
+                # At most ``limit`` newest messages, so a long-idle channel costs one
+                # page like a first view instead of walking everything since the watermark.
+                newer = list(islice(
+                    iter_messages(token, channel_id, oldest=newest_ts, page_size=min(limit, PAGE_SIZE)), limit,
+                ))
+                if newest_ts and len(newer) >= limit:
+                    # There may be a gap behind these; drop the older rows so the
+                    # cache stays contiguous and refetch history on demand.
+                    self._merge(token_key, channel_id, newer, complete=False, replace=True)
+                else:
+                    self._merge(token_key, channel_id, newer, complete=bool(complete))
+
+            missing = limit - self._count(token_key, channel_id)
+            if missing > 0 and not complete:
+                older = list(islice(
+                    iter_messages(token, channel_id, latest=oldest_ts, page_size=min(missing, PAGE_SIZE)),
+                    missing,
+                ))
+                self._merge(token_key, channel_id, older, complete=len(older) < missing)
+
+            return self._latest(token_key, channel_id, limit)
+
+    def get_conversations(self, token: str, *, limit: int) -> list[dict[str, Any]]:
+        """Return the conversation list, refetching it once it is older than the TTL."""
+
+        token_key = _token_key(token)
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT payload, complete, fetched_at FROM conversations WHERE token_key = ?", (token_key,)
+            ).fetchone()
+        if row is not None and time.time() - row[2] < CONVERSATIONS_TTL_SECONDS:
+            conversations = json.loads(row[0])
+            if row[1] or len(conversations) >= limit:
+                return conversations[:limit]
+
+        conversations = list(islice(iter_conversations(token), limit))
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO conversations (token_key, payload, complete, fetched_at)"
+                " VALUES (?, ?, ?, ?)",
+                (token_key, json.dumps(conversations), int(len(conversations) < limit), time.time()),
+            )
+        return conversations
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+"""Feed normalized Slack messages to the classifier backend's ``/slack/ingest``.
+
+Enabled by setting ``CLASSIFIER_INGEST_URL`` (for example
+``http://localhost:8000/slack/ingest``) alongside ``SLACK_USER_TOKEN``. A
+background thread syncs every conversation the token is a member of through
+the history cache, independently of dashboard views, and posts the messages
+it has not forwarded yet, tagged with the channel name.
+
+Batches are posted one at a time from that thread. A 429, a 503 or a
+connection error is retried after ``Retry-After`` (or a growing backoff)
+until it succeeds, so a busy backend delays the feed instead of losing
+messages, and memory stays bounded by one channel's batch.
+"""
+
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from typing import Any, Callable
+
+from .cache import SlackCache
+from .metrics import registry
+from .normalize import NormalizedMessage, normalize_messages
+from .slack_client import DEFAULT_CONVERSATION_LIMIT, DEFAULT_MESSAGE_LIMIT
+
+CLASSIFIER_INGEST_URL = os.getenv("CLASSIFIER_INGEST_URL", "")
+FORWARD_SYNC_SECONDS = float(os.getenv("CLASSIFIER_FORWARD_SYNC_SECONDS", "30"))
+# Newest messages read per channel and sync; anything older than that between syncs is skipped.
+FORWARD_SYNC_LIMIT = DEFAULT_MESSAGE_LIMIT
+# Stays below the backend's per-request cap on /slack/ingest.
+FORWARD_BATCH_SIZE = 200
+FORWARD_TIMEOUT_SECONDS = 10.0
+FORWARD_MAX_BACKOFF_SECONDS = 60.0
+# Backend answers that mean "not now" rather than "never".
+RETRY_STATUS_CODES = {429, 503}
+
+FORWARDED_BATCHES = registry.counter(
+    "classifier_forward_batches_total", "Message batches forwarded to the classifier.", ("outcome",),
+)
+FORWARDED_MESSAGES = registry.counter("classifier_forward_messages_total", "Messages delivered to the classifier.")
+
+
+def channel_name(conversation: dict[str, Any]) -> str:
+    """Readable name for a conversation from ``conversations.list``."""
+
+    return conversation.get("name") or conversation.get("user") or conversation["id"]
+
+
+class ClassifierForwarder:
+    """Background sync of cached Slack history into the classifier."""
+
+    def __init__(
+        self,
+        get_cache: Callable[[], SlackCache],
+        token: str,
+        url: str = CLASSIFIER_INGEST_URL,
+        interval: float = FORWARD_SYNC_SECONDS,
+    ) -> None:
+        self._get_cache = get_cache
+        self._token = token
+        self._url = url
+        self._interval = interval
+        # Newest ``ts`` delivered per channel.
+        self._forwarded: dict[str, float] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="classifier-forward", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sync()
+            except Exception as error:  # Keep the feed alive across Slack or backend failures.
+                print(f"Classifier forward sync failed: {type(error).__name__}: {error}")
+            self._stop.wait(self._interval)
+
+    def sync(self) -> None:
+        """Forward new messages from every conversation the token belongs to."""
+
+        cache = self._get_cache()
+        for conversation in cache.get_conversations(self._token, limit=DEFAULT_CONVERSATION_LIMIT):
+            if self._stop.is_set():
+                return
+            if conversation.get("is_member") is False:
+                continue
+            channel_id = conversation["id"]
+            messages = cache.get_messages(self._token, channel_id, limit=FORWARD_SYNC_LIMIT)
+            forwarded = self._forwarded.get(channel_id, 0.0)
+            new = [m for m in messages if float(m.get("ts") or 0) > forwarded]
+            if not new:
+                continue
+            # Oldest first, so the watermark only advances past delivered messages.
+            normalized = normalize_messages(new[::-1], channel_id)
+            for start in range(0, len(normalized), FORWARD_BATCH_SIZE):
+                batch = normalized[start:start + FORWARD_BATCH_SIZE]
+                if not self._deliver(batch, channel_name(conversation)):
+                    return
+                self._forwarded[channel_id] = float(batch[-1]["timestamp"])
+
+    def _deliver(self, messages: list[NormalizedMessage], name: str) -> bool:
+        """Post one batch, retrying until the backend answers; False only when stopping.
+
+        A batch the backend refuses outright (say, 422) is logged and skipped
+        so it cannot hold up the channel's later messages.
+        """
+
+        body = json.dumps({"channel_name": name, "messages": messages}).encode()
+        backoff = 1.0
+        while not self._stop.is_set():
+            request = urllib.request.Request(
+                self._url, data=body, headers={"Content-Type": "application/json"}, method="POST",
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=FORWARD_TIMEOUT_SECONDS):
+                    FORWARDED_BATCHES.inc(outcome="ok")
+                    FORWARDED_MESSAGES.inc(len(messages))
+                    return True
+            except urllib.error.HTTPError as error:
+                if error.code not in RETRY_STATUS_CODES:
+                    FORWARDED_BATCHES.inc(outcome="rejected")
+                    print(f"Classifier rejected {len(messages)} messages from {name}: HTTP {error.code}")
+                    return True
+                retry_after = error.headers.get("Retry-After", "")
+                wait = float(retry_after) if retry_after.isdigit() else backoff
+            except OSError:
+                wait = backoff
+            FORWARDED_BATCHES.inc(outcome="retried")
+            self._stop.wait(wait)
+            backoff = min(backoff * 2, FORWARD_MAX_BACKOFF_SECONDS)
+        return False
+
+
+def start_forwarder(get_cache: Callable[[], SlackCache]) -> ClassifierForwarder | None:
+    """Start the background feed when both the ingest URL and a Slack token are configured."""
+
+    token = os.getenv("SLACK_USER_TOKEN")
+    if not CLASSIFIER_INGEST_URL or not token:
+        return None
+    forwarder = ClassifierForwarder(get_cache, token)
+    forwarder.start()
+    return forwarder
@@ -26,11 +26,60 @@ class SlackMessage(TypedDict, total=False):
     user: str
 
 
+class ThreadNode(NormalizedMessage):
+    replies: list[ThreadNode]
+
+
+class ThreadIndex:
+    """Parent/reply lookups for normalized messages, filled in one pass.
+
+    ``replies`` maps each parent ID to its reply IDs in timestamp order, and
+    ``roots`` maps each reply ID to the top of its thread.
+    """
+
+    def __init__(self) -> None:
+        self.replies: dict[str, list[str]] = {}
+        self.roots: dict[str, str] = {}
+        self._parents: dict[str, str] = {}
+
+    def add(self, message: NormalizedMessage) -> None:
+        parent_id = get_parent_id(message)
+        if parent_id is not None:
+            self._parents[message["message_id"]] = parent_id
+            self.replies.setdefault(parent_id, []).append(message["message_id"])
+
+    def finalize(self) -> None:
+        """Order replies by timestamp and resolve each reply's root."""
+
+        for reply_ids in self.replies.values():
+            reply_ids.sort(key=float)
+
+        for message_id in self._parents:
+            chain = []
+            current = message_id
+            while current in self._parents and current not in self.roots:
+                chain.append(current)
+                current = self._parents[current]
+            root = self.roots.get(current, current)
+            for node in chain:
+                self.roots[node] = root
+
+    def reply_ids(self, message_id: str) -> list[str]:
+        return self.replies.get(message_id, [])
+
+    def root_id(self, message_id: str) -> str:
+        return self.roots.get(message_id, message_id)
+
+
 def normalize_messages(
     messages: Sequence[SlackMessage],
     conversation_id: str,
+    thread_index: ThreadIndex | None = None,
 ) -> list[NormalizedMessage]:
-    """Normalize Slack history responses into a flat, reference-friendly shape."""
+    """Normalize Slack history responses into a flat, reference-friendly shape.
+
+    When ``thread_index`` is given it is populated in the same pass.
+    """
 
     normalized: list[NormalizedMessage] = []
 
@@ -45,17 +94,20 @@ def normalize_messages(
         if thread_ts and thread_ts != ts:
             ref_message_ids.append({"message_id": thread_ts, "ref_type": "parent"})
 
-        normalized.append(
-            {
-                "message_id": ts,
-                "conversation_id": conversation_id,
-                "text": message.get("text", ""),
-                "user": message.get("user", ""),
-                "timestamp": ts,
-                "ref_message_ids": ref_message_ids,
-            }
-        )
-
+        entry: NormalizedMessage = {
+            "message_id": ts,
+            "conversation_id": conversation_id,
+            "text": message.get("text", ""),
+            "user": message.get("user", ""),
+            "timestamp": ts,
+            "ref_message_ids": ref_message_ids,
+        }
+        normalized.append(entry)
+        if thread_index is not None:
+            thread_index.add(entry)
+
+    if thread_index is not None:
+        thread_index.finalize()
     return normalized
 
 
@@ -68,8 +120,43 @@ def get_parent_id(message: NormalizedMessage) -> str | None:
     return None
 
 
-def get_reply_ids(message: NormalizedMessage, all_messages: Sequence[NormalizedMessage]) -> list[str]:
-    """Return the message IDs that reference the provided message as their parent."""
+def get_reply_ids(
+    message: NormalizedMessage,
+    all_messages: Sequence[NormalizedMessage],
+    thread_index: ThreadIndex | None = None,
+) -> list[str]:
+    """Return the message IDs that reference the provided message as their parent.
+
+    Pass a ``thread_index`` to avoid scanning ``all_messages`` on every call.
+    """
+
+    if thread_index is not None:
+        return thread_index.reply_ids(message["message_id"])
 
     target_id = message["message_id"]
     return [msg["message_id"] for msg in all_messages if get_parent_id(msg) == target_id]
+
+
+def build_thread_tree(
+    messages: Sequence[NormalizedMessage],
+    thread_index: ThreadIndex,
+) -> list[ThreadNode]:
+    """Nest replies under their parents.
+
+    Top-level entries keep the order of ``messages``. Replies whose parent is
+    not in ``messages`` stay at the top level rather than being dropped.
+    """
+
+    nodes: dict[str, ThreadNode] = {
+        message["message_id"]: {**message, "replies": []} for message in messages
+    }
+    for parent_id, reply_ids in thread_index.replies.items():
+        parent = nodes.get(parent_id)
+        if parent is not None:
+            parent["replies"] = [nodes[reply_id] for reply_id in reply_ids if reply_id in nodes]
+
+    return [
+        nodes[message["message_id"]]
+        for message in messages
+        if get_parent_id(message) not in nodes
+    ]
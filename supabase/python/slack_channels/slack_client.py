@@ -1,35 +1,207 @@
 from __future__ import annotations
 
-"""Thin wrappers around the Slack Web API using the official Python SDK."""
+"""Thin wrappers around the Slack Web API using the official Python SDK.
 
-from typing import Any
+Clients are cached per token, results are read across every cursor page, and
+calls are paced to Slack's per-method rate tiers. A 429 pauses the method for
+the ``Retry-After`` interval before retrying.
+"""
+
+import os
+import threading
+import time
+from itertools import islice
+from typing import Any, Iterator
 
 from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web import SlackResponse
+
+from .metrics import registry, span
 
 DEFAULT_MESSAGE_LIMIT = 100
 DEFAULT_CONVERSATION_LIMIT = 1000
+# Slack recommends no more than 200 results per page for paginated methods.
+PAGE_SIZE = 200
+MAX_RATE_LIMIT_RETRIES = 5
+SLACK_API_URL = os.getenv("SLACK_API_URL", WebClient.BASE_URL)
+
+# Requests per minute allowed for each tier, see https://docs.slack.dev/apis/web-api/rate-limits
+TIER_REQUESTS_PER_MINUTE = {1: 1, 2: 20, 3: 50, 4: 100}
+METHOD_TIERS = {
+    "conversations.list": 2,
+    "conversations.history": 3,
+    "conversations.replies": 3,
+}
+DEFAULT_TIER = 3
+
+SLACK_API_SECONDS = registry.histogram(
+    "slack_api_seconds", "Slack Web API call latency per attempt.", ("method", "outcome"),
+)
+SLACK_RATE_LIMITED = registry.counter("slack_rate_limited_total", "Slack 429 responses.", ("method",))
+SLACK_RATE_LIMIT_WAIT_SECONDS = registry.histogram(
+    "slack_rate_limit_wait_seconds", "Time spent waiting for the per-method rate limiter.", ("method",),
+)
+
+
+class _RateLimiter:
+    """Token bucket pacing one method for one token, with short bursts allowed."""
+
+    def __init__(self, requests_per_minute: int):
+        self.rate = requests_per_minute / 60.0
+        # Matches method_concurrency, so a full batch of parallel calls can start at once.
+        self.capacity = max(1.0, requests_per_minute / 10.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                wait = self.paused_until - now
+                if wait <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+
+_clients: dict[str, WebClient] = {}
+_limiters: dict[tuple[str, str], _RateLimiter] = {}
+_registry_lock = threading.Lock()
+
+
+def method_concurrency(method: str) -> int:
+    """Parallel calls worth issuing for a method: the burst its tier allows."""
+
+    tier = METHOD_TIERS.get(method, DEFAULT_TIER)
+    return max(1, TIER_REQUESTS_PER_MINUTE[tier] // 10)
 
 
 def _client(token: str) -> WebClient:
-    return WebClient(token=token)
+    with _registry_lock:
+        client = _clients.get(token)
+        if client is None:
+            client = _clients[token] = WebClient(token=token, base_url=SLACK_API_URL)
+        return client
 
 
-def get_conversations(token: str, *, limit: int = DEFAULT_CONVERSATION_LIMIT) -> list[dict[str, Any]]:
-    """Return all accessible conversations (public, private, IM, and MPIM).
+def _limiter(token: str, method: str) -> _RateLimiter:
+    with _registry_lock:
+        limiter = _limiters.get((token, method))
+        if limiter is None:
+            tier = METHOD_TIERS.get(method, DEFAULT_TIER)
+            limiter = _limiters[(token, method)] = _RateLimiter(TIER_REQUESTS_PER_MINUTE[tier])
+        return limiter
+
+
+def _retry_after(error: SlackApiError) -> float:
+    headers = getattr(error.response, "headers", None) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after") or 1
+    try:
+        return float(value[0] if isinstance(value, list) else value)
+    except (TypeError, ValueError):
+        return 1.0
+
+
+def call(token: str, method: str, **params: Any) -> SlackResponse:
+    """Call a read-only Web API method, waiting out rate limits."""
+
+    client = _client(token)
+    limiter = _limiter(token, method)
+    params = {key: value for key, value in params.items() if value is not None}
+
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        waited = time.perf_counter()
+        limiter.acquire()
+        start = time.perf_counter()
+        SLACK_RATE_LIMIT_WAIT_SECONDS.observe(start - waited, method=method)
+        try:
+            with span("slack_api", method=method, attempt=attempt):
+                response = client.api_call(method, http_verb="GET", params=params)
+        except SlackApiError as error:
+            status = getattr(error.response, "status_code", None)
+            SLACK_API_SECONDS.observe(time.perf_counter() - start, method=method, outcome=str(status or "error"))
+            if status == 429:
+                SLACK_RATE_LIMITED.inc(method=method)
+            if status != 429 or attempt == MAX_RATE_LIMIT_RETRIES:
+                raise
+            limiter.pause(_retry_after(error))
+        else:
+            SLACK_API_SECONDS.observe(time.perf_counter() - start, method=method, outcome="ok")
+            return response
+    raise AssertionError("unreachable")
+
+
+def iter_pages(token: str, method: str, *, page_size: int = PAGE_SIZE, **params: Any) -> Iterator[SlackResponse]:
+    """Yield every page of a cursor-paginated method, following ``next_cursor``."""
+
+    cursor = None
+    while True:
+        response = call(token, method, limit=page_size, cursor=cursor, **params)
+        yield response
+        cursor = (response.get("response_metadata") or {}).get("next_cursor")
+        if not cursor:
+            return
+
+
+def iter_conversations(token: str) -> Iterator[dict[str, Any]]:
+    """Yield accessible conversations (public, private, IM, and MPIM) across all pages.
 
     Mirrors https://docs.slack.dev/tools/python-slack-sdk/web/#conversations
     """
 
-    response = _client(token).conversations_list(
+    for page in iter_pages(
+        token,
+        "conversations.list",
         types="public_channel,private_channel,mpim,im",
         exclude_archived=True,
-        limit=limit,
-    )
-    return list(response.get("channels", []))
+    ):
+        yield from page.get("channels", [])
+
+
+def iter_messages(
+    token: str,
+    channel_id: str,
+    *,
+    oldest: str | None = None,
+    latest: str | None = None,
+    page_size: int = PAGE_SIZE,
+) -> Iterator[dict[str, Any]]:
+    """Yield a conversation's messages newest first via conversations.history.
+
+    ``oldest`` and ``latest`` are exclusive ``ts`` bounds.
+    """
+
+    for page in iter_pages(
+        token,
+        "conversations.history",
+        page_size=page_size,
+        channel=channel_id,
+        oldest=oldest,
+        latest=latest,
+    ):
+        yield from page.get("messages", [])
+
+
+def get_conversations(token: str, *, limit: int = DEFAULT_CONVERSATION_LIMIT) -> list[dict[str, Any]]:
+    """Return up to ``limit`` accessible conversations."""
+
+    return list(islice(iter_conversations(token), limit))
 
 
 def get_messages(token: str, channel_id: str, *, limit: int = DEFAULT_MESSAGE_LIMIT) -> list[dict[str, Any]]:
-    """Return recent messages for a conversation via conversations.history."""
+    """Return the ``limit`` most recent messages for a conversation."""
 
-    response = _client(token).conversations_history(channel=channel_id, limit=limit)
-    return list(response.get("messages", []))
+    page_size = min(limit, PAGE_SIZE)
+    return list(islice(iter_messages(token, channel_id, page_size=page_size), limit))